@@ -1,9 +1,33 @@
 import os
+from typing import Literal
+from pydantic import SecretStr
 from pydantic_settings import BaseSettings
 from loguru import logger
 
 class Settings(BaseSettings):
     API_PREFIX: str  = os.getenv("API_PREFIX", "/meditron-api")
+    RESPONSE_TABLE_DIR: str = os.getenv("RESPONSE_TABLE_DIR", "src/math_models/response_table")
+    RESPONSE_TABLE_KI67_TOLERANCE: float = float(os.getenv("RESPONSE_TABLE_KI67_TOLERANCE", "0.5"))
+    RESPONSE_TABLE_SIZE_TOLERANCE: float = float(os.getenv("RESPONSE_TABLE_SIZE_TOLERANCE", "0"))
+    DOSE_SEARCH: str = os.getenv("DOSE_SEARCH", "grid")
+    COMBINED_DOSE_SEARCH: str = os.getenv("COMBINED_DOSE_SEARCH", "continuous")
+    POPULATION_N_PATIENTS: int = int(os.getenv("POPULATION_N_PATIENTS", "200"))
+    POPULATION_SEED: int = int(os.getenv("POPULATION_SEED", "0"))
+    PK_CACHE_MAX_BYTES: int = int(os.getenv("PK_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    PK_STORE_DIR: str = os.getenv("PK_STORE_DIR", "src/math_models/pk_store")
+    WARMUP: Literal["off", "pk", "full"] = os.getenv("WARMUP", "pk")
+    PROFILE_SAMPLE_RATE: float = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+    PROFILE_WINDOW_SECONDS: float = float(os.getenv("PROFILE_WINDOW_SECONDS", "300"))
+    MODELS_DIR: str = os.getenv("MODELS_DIR", "src/ml/cox_models")
+    MODELS_WATCH_INTERVAL: float = float(os.getenv("MODELS_WATCH_INTERVAL", "30"))
+    ADMIN_TOKEN: SecretStr = SecretStr(os.getenv("ADMIN_TOKEN", ""))
+    MONGO_URL: str = os.getenv("MONGO_URL", "")
+    MONGO_DB: str = os.getenv("MONGO_DB", "testdb")
+    MONGO_TIMEOUT_MS: int = int(os.getenv("MONGO_TIMEOUT_MS", "2000"))
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_JSON: bool = os.getenv("LOG_JSON", "0") == "1"
+    REQUEST_LOG_SAMPLE_RATE: float = float(os.getenv("REQUEST_LOG_SAMPLE_RATE", "1"))
+    RESULT_STORE_TTL: int = int(os.getenv("RESULT_STORE_TTL", str(7 * 24 * 3600)))
 
 config = Settings()
 logger.info(config)
\ No newline at end of file
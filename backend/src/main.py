@@ -1,12 +1,39 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
+from loguru import logger
 
 
 #import uvicorn
 from src.config import config
+from src.service.request_log import request_log_middleware, setup_logging
+
+setup_logging()
+
+from src.ml.model import registry
+from src.service.profiling import profile_middleware, sampler
+from src.service.report_service import result_store
+from src.service.warmup import warmup
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    registry.start_watching(config.MODELS_WATCH_INTERVAL)
+    sampler.start()
+    await result_store.start()
+    # прогрев не блокирует старт: пока он идёт, /health/ready отвечает 503
+    warmup_task = asyncio.create_task(warmup.run(config.WARMUP))
+    yield
+    warmup_task.cancel()
+    sampler.stop()
+    await result_store.stop()
+    await logger.complete()
+
 
-fastapi_app = FastAPI(docs_url=f'{config.API_PREFIX}/docs',)
+fastapi_app = FastAPI(docs_url=f'{config.API_PREFIX}/docs', lifespan=lifespan)
 
 fastapi_app.add_middleware(
     CORSMiddleware,
@@ -15,6 +42,12 @@ fastapi_app.add_middleware(
     allow_methods=['*'],
     allow_headers=['*'],
 )
+fastapi_app.middleware("http")(profile_middleware)
+fastapi_app.middleware("http")(request_log_middleware)
 
 from src.routers.report_router import router as report_router
-fastapi_app.include_router(report_router)
\ No newline at end of file
+from src.routers.admin_router import router as admin_router
+from src.routers.health_router import router as health_router
+fastapi_app.include_router(report_router)
+fastapi_app.include_router(admin_router)
+fastapi_app.include_router(health_router)
@@ -1,8 +1,17 @@
+import time
+
 import numpy as np
 import matplotlib.pyplot as plt
 from itertools import product
 from scipy.integrate import solve_ivp
+from scipy.optimize import minimize
 from scipy.interpolate import interp1d
+from scipy.signal import lfilter
+from loguru import logger
+
+from src.math_models.pk_cache import pk_cache
+from src.math_models.regimens import FRONTEND_REGIMENS, INTERVAL_TO_DAYS, REGIMENS, get_regimen
+from src.math_models.results import SimulationResult
 
 T_cycle_dict = {
     "HR+": 3.0, 
@@ -212,49 +221,94 @@ def E_of_C(C, E_max, EC50):
     return E_max * C / (C + EC50 + 1e-12)
 
 
-def pk_input_cycles(t, cycle_len=21.0, dose_amount=100.0):
+# площадь поверхности тела, если рост и вес пациента не указаны, м²
+DEFAULT_BSA = 1.7
 
-    if abs(t % cycle_len) < 1e-6:
-        return dose_amount
-    return 0.0
+# шаг округления BSA: результаты симуляции считаются и кэшируются по корзинам, м²
+BSA_BUCKET = 0.05
 
 
-def pk_one_comp_ode(t, y, CL, V1, input_func=None):
-    A = y[0]
-    I = input_func(t) if input_func else 0.0
-    dA_dt = -(CL / V1) * A + I
-    return [dA_dt]
+def bsa_mosteller(height_cm, weight_kg):
+    return float(np.sqrt(height_cm * weight_kg / 3600.0))
 
 
-def pk_two_comp_ode(t, y, CL, Q, V1, V2, input_func=None):
-    A1, A2 = y
-    I = input_func(t) if input_func else 0.0
+def bucket_bsa(bsa):
+    return round(round(bsa / BSA_BUCKET) * BSA_BUCKET, 2)
 
-    dA1dt = -(CL / V1) * A1 - (Q / V1) * A1 + (Q / V2) * A2 + I
-    dA2dt = (Q / V1) * A1 - (Q / V2) * A2
-    return [dA1dt, dA2dt]
 
+# шаг сетки, на которой считаются концентрации и суммарный эффект препаратов, дни
+PK_GRID_STEP = 0.25
 
-def simulate_pk_two_comp(CL, Q, V1, V2, y0, t_end, n_points=2000, input_func=None):
-    t_eval = np.linspace(0.0, t_end, 2000)
 
-    sol = solve_ivp(
-        lambda tt, yy: pk_two_comp_ode(tt, yy, CL, Q, V1, V2, input_func),
-        [0.0, t_end],
-        y0,
-        t_eval=t_eval,
-    )
+def pk_time_grid(t_end):
+    n = int(np.ceil(t_end / PK_GRID_STEP)) + 1
+    return np.arange(n) * PK_GRID_STEP
 
-    A1 = sol.y[0]
-    C1 = A1 / V1
-    C_interp = interp1d(t_eval, C1, fill_value="extrapolate")
-    return C_interp
+
+def pk_impulse_response(drug_name, cl_scale=1.0):
+    """
+    Концентрация в центральной камере после болюса 1 мг:
+    C(t) = sum(coefs * exp(-rates * t)); cl_scale масштабирует клиренс CL
+    """
+    if drug_name not in PK_PD_PARAMS:
+        raise ValueError(f"Препарат {drug_name} отсутствует в PK_PD_PARAMS")
+
+    p = PK_PD_PARAMS[drug_name]
+    CL, Q, V1, V2 = p["CL"] * cl_scale, p["Q"], p["V1"], p["V2"]
+
+    if Q == 0 or V2 == 0:
+        return np.array([CL / V1]), np.array([1.0 / V1])
+
+    k10, k12, k21 = CL / V1, Q / V1, Q / V2
+    s = k10 + k12 + k21
+    root = np.sqrt(s * s - 4.0 * k10 * k21)
+    alpha, beta = (s + root) / 2.0, (s - root) / 2.0
+    coefs = np.array([(alpha - k21) / (alpha - beta), (k21 - beta) / (alpha - beta)]) / V1
+    return np.array([alpha, beta]), coefs
+
+
+def superpose_doses(t_grid, event_time, event_amount, rates, coefs):
+    """
+    Суперпозиция болюсных введений на равномерной сетке t_grid.
+
+    Каждое введение переносится в первый узел сетки не раньше него с точной поправкой
+    exp(-rate * lag), после чего экспоненциальное ядро применяется рекурсивным фильтром.
+    """
+    C = np.zeros(t_grid.size)
+    if event_time.size == 0:
+        return C
+
+    dt = t_grid[1] - t_grid[0]
+    idx = np.searchsorted(t_grid, event_time, side="left")
+    keep = idx < t_grid.size
+    idx, lag, amount = idx[keep], t_grid[idx[keep]] - event_time[keep], event_amount[keep]
+
+    for rate, coef in zip(rates, coefs):
+        impulses = np.bincount(idx, weights=amount * np.exp(-rate * lag), minlength=t_grid.size)
+        C += coef * lfilter([1.0], [1.0, -np.exp(-rate * dt)], impulses)
+    return C
+
+
+def pk_curve_key(drug_name, event_time, event_dose, t_grid):
+    """Ключ единичной кривой в pk_cache и в общем файле кривых (src.math_models.pk_store)"""
+    return (drug_name, event_time.tobytes(), event_dose.tobytes(), t_grid.size)
+
+
+def pk_unit_curve(drug_name, event_time, event_dose, t_grid):
+    """
+    Концентрация на сетке t_grid для введений event_dose в моменты event_time
+    (из общего кэша pk_cache); кривая линейна по дозам и масштабируется вызывающим кодом
+    """
+    return pk_cache.get_or_compute(
+        pk_curve_key(drug_name, event_time, event_dose, t_grid),
+        lambda: superpose_doses(t_grid, event_time, event_dose, *pk_impulse_response(drug_name)),
+    )
 
 
 def build_single_drug_pkpd(
     drug_name,
     t_end=365.0,
-    bsa=1.7,
+    bsa=DEFAULT_BSA,
     dose_abs_override=None,
     schedule_override=None,
 ):
@@ -263,8 +317,6 @@ def build_single_drug_pkpd(
         raise ValueError(f"Препарат {drug_name} отсутствует в PK_PD_PARAMS")
 
     p = PK_PD_PARAMS[drug_name]
-    CL, Q, V1, V2 = p["CL"], p["Q"], p["V1"], p["V2"]
-    is_one_comp = (Q == 0 or V2 == 0)
     E_max, EC50 = p["E_max"], p["EC50"]
 
     schedule = schedule_override if schedule_override is not None else p["schedule"]
@@ -280,495 +332,39 @@ def build_single_drug_pkpd(
         else:
             raise ValueError(f"Не найдена доза для препарата {drug_name}")
 
+    cycle = INTERVAL_TO_DAYS.get(schedule)
+    event_time = np.arange(0.0, t_end, cycle) if cycle is not None else np.array([0.0])
 
-    if schedule == "q3w":
-        cycle = 21.0
-    elif schedule == "q2w":
-        cycle = 14.0
-    elif schedule == "weekly":
-        cycle = 7.0
-    elif schedule == "daily":
-        cycle = 1.0
-    elif schedule == "q4w":
-        cycle = 28.0
-    elif schedule == "q6m":
-        cycle = 180.0
-    else:
-        cycle = None 
-
-    if cycle is not None:
-        input_func = lambda tt, d=dose_abs, c=cycle: pk_input_cycles(tt, c, d)
-        y0 = [0.0, 0.0]
-    else:
-
-        input_func = None
-        y0 = [dose_abs, 0.0]
-
- 
-    if is_one_comp:
-        def pk_ode(tt, yy):
-            return pk_one_comp_ode(tt, yy, CL, V1, input_func)
-
-        t_eval = np.linspace(0.0, t_end, 2000)
-        sol = solve_ivp(pk_ode, [0.0, t_end], [0.0], t_eval=t_eval)
-        C = sol.y[0] / V1
-        C_func = interp1d(t_eval, C, fill_value="extrapolate")
-    else:
-        C_func = simulate_pk_two_comp(
-            CL, Q, V1, V2,
-            y0=y0,
-            t_end=t_end,
-            n_points=2000,
-            input_func=input_func,
-        )
+    t_grid = pk_time_grid(t_end)
+    C = float(dose_abs) * pk_unit_curve(drug_name, event_time, np.ones(event_time.size), t_grid)
+    C_func = interp1d(t_grid, C, fill_value="extrapolate")
 
     return C_func, E_max, EC50
 
 
+def regimen_concentrations(reg, dose_multipliers, t_grid, bsa=DEFAULT_BSA):
+    """Концентрации всех препаратов схемы на сетке t_grid, массив [n_drugs, n_t]"""
+    C = np.empty((len(reg.drugs), t_grid.size))
+    for i, info in enumerate(reg.drug_info):
+        mask = reg.event_drug == i
+        scale = dose_multipliers.get(info.pk_name, 1.0)
+        C[i] = _compute_absolute_dose(1.0, info.unit, scale, bsa) * pk_unit_curve(
+            info.pk_name, reg.event_time[mask], reg.event_dose[mask], t_grid
+        )
+    return C
 
-FRONTEND_REGIMENS = {
-    "Летрозол": {
-        "type": "simple",
-        "drugs": [
-            {
-                "pk_name": "letrozole",
-                "dose": 2.5,
-                "unit": "mg",
-                "interval": "daily",
-                "n_cycles": 365,  
-            }
-        ],
-    },
-    "Анастрозол": {
-        "type": "simple",
-        "drugs": [
-            {
-                "pk_name": "anastrozole",
-                "dose": 1.0,
-                "unit": "mg",
-                "interval": "daily",
-                "n_cycles": 365,
-            }
-        ],
-    },
-    "Фулвестрант": {
-        "type": "simple",
-        "drugs": [
-            {
-                "pk_name": "fulvestrant",
-                "dose": 500.0,
-                "unit": "mg",
-                "interval": "q4w",
-                "n_cycles": 12,   # 1 год
-            }
-        ],
-    },
-    "Бусерелин": {
-        "type": "simple",
-        "drugs": [
-            {
-                "pk_name": "buserelin",
-                "dose": 3.75,
-                "unit": "mg",
-                "interval": "q4w",
-                "n_cycles": 12,
-            }
-        ],
-    },
-    "Торемифен": {
-        "type": "simple",
-        "drugs": [
-            {
-                "pk_name": "toremifene",
-                "dose": 60.0,
-                "unit": "mg",
-                "interval": "daily",
-                "n_cycles": 365,
-            }
-        ],
-    },
-    "Тамоксифен → ингибиторы ароматазы": {
-        "type": "phased",
-        "phases": [
-            {
-                "duration_days": 3 * 365,
-                "drugs": [
-                    {
-                        "pk_name": "tamoxifen",
-                        "dose": 20.0,
-                        "unit": "mg",
-                        "interval": "daily",
-                    }
-                ],
-            },
-            {
-                "duration_days": 2 * 365,
-                "drugs": [
-                    {
-                        "pk_name": "letrozole", 
-                        "dose": 2.5,
-                        "unit": "mg",
-                        "interval": "daily",
-                    }
-                ],
-            },
-        ],
-    },
-
-    "(DC + трастузумаб) × 4–6": {
-        "type": "phased",
-        "phases": [
-            {
-                "duration_days": 6 * 21,
-                "drugs": [
-                    {"pk_name": "docetaxel", "dose": 75, "unit": "mg/m2", "interval": "q3w"},
-                    {"pk_name": "cyclophosphamide", "dose": 600, "unit": "mg/m2", "interval": "q3w"},
-                    {"pk_name": "trastuzumab_sc", "dose": 600, "unit": "mg", "interval": "q3w"},
-                ],
-            }
-        ],
-    },
-    "DCН × 6": {
-        "type": "phased",
-        "phases": [
-            {
-                "duration_days": 6 * 21,
-                "drugs": [
-                    {"pk_name": "docetaxel", "dose": 75, "unit": "mg/m2", "interval": "q3w"},
-                    {"pk_name": "carboplatin", "dose": 600, "unit": "mg/m2", "interval": "q3w"},
-                    {"pk_name": "trastuzumab_sc", "dose": 600, "unit": "mg", "interval": "q3w"},
-                ],
-            }
-        ],
-    },
-    "DCН + пертузумаб × 6": {
-        "type": "phased",
-        "phases": [
-            {
-                "duration_days": 6 * 21,
-                "drugs": [
-                    {"pk_name": "docetaxel", "dose": 75, "unit": "mg/m2", "interval": "q3w"},
-                    {"pk_name": "carboplatin", "dose": 600, "unit": "mg/m2", "interval": "q3w"},
-                    {"pk_name": "trastuzumab_sc", "dose": 600, "unit": "mg", "interval": "q3w"},
-                    {"pk_name": "pertuzumab", "dose": 420, "unit": "mg", "interval": "q3w"},
-                ],
-            }
-        ],
-    },
-    "(Р + трастузумаб) × 12": {
-        "type": "phased",
-        "phases": [
-            {
-                "duration_days": 12 * 7,
-                "drugs": [
-                    {"pk_name": "paclitaxel", "dose": 80, "unit": "mg/m2", "interval": "weekly"},
-                    {"pk_name": "trastuzumab_sc", "dose": 600, "unit": "mg", "interval": "weekly"},
-                ],
-            }
-        ],
-    },
-    "AC × 4 → (D + трастузумаб) × 4": {
-        "type": "phased",
-        "phases": [
-            {
-                "duration_days": 4 * 21,
-                "drugs": [
-                    {"pk_name": "doxorubicin", "dose": 60, "unit": "mg/m2", "interval": "q3w"},
-                    {"pk_name": "cyclophosphamide", "dose": 600, "unit": "mg/m2", "interval": "q3w"},
-                ],
-            },
-            {
-                "duration_days": 4 * 21,
-                "drugs": [
-                    {"pk_name": "docetaxel", "dose": 75, "unit": "mg/m2", "interval": "q3w"},
-                    {"pk_name": "trastuzumab_sc", "dose": 600, "unit": "mg", "interval": "q3w"},
-                ],
-            },
-        ],
-    },
-    "AC × 4 → (Р + трастузумаб) × 12": {
-        "type": "phased",
-        "phases": [
-            {
-                "duration_days": 4 * 21,
-                "drugs": [
-                    {"pk_name": "doxorubicin", "dose": 60, "unit": "mg/m2", "interval": "q3w"},
-                    {"pk_name": "cyclophosphamide", "dose": 600, "unit": "mg/m2", "interval": "q3w"},
-                ],
-            },
-            {
-                "duration_days": 12 * 7,
-                "drugs": [
-                    {"pk_name": "paclitaxel", "dose": 80, "unit": "mg/m2", "interval": "weekly"},
-                    {"pk_name": "trastuzumab_sc", "dose": 600, "unit": "mg", "interval": "weekly"},
-                ],
-            },
-        ],
-    },
-    "ddAC × 4 → (Р + трастузумаб) × 12": {
-        "type": "phased",
-        "phases": [
-            {
-                "duration_days": 4 * 14,
-                "drugs": [
-                    {"pk_name": "doxorubicin", "dose": 60, "unit": "mg/m2", "interval": "q2w"},
-                    {"pk_name": "cyclophosphamide", "dose": 600, "unit": "mg/m2", "interval": "q2w"},
-                ],
-            },
-            {
-                "duration_days": 12 * 7,
-                "drugs": [
-                    {"pk_name": "paclitaxel", "dose": 80, "unit": "mg/m2", "interval": "weekly"},
-                    {"pk_name": "trastuzumab_sc", "dose": 600, "unit": "mg", "interval": "weekly"},
-                ],
-            },
-        ],
-    },
-    "ddАС × 4 → (Р + трастузумаб) × 4": {
-        "type": "phased",
-        "phases": [
-            {
-                "duration_days": 4 * 14,
-                "drugs": [
-                    {"pk_name": "doxorubicin", "dose": 60, "unit": "mg/m2", "interval": "q2w"},
-                    {"pk_name": "cyclophosphamide", "dose": 600, "unit": "mg/m2", "interval": "q2w"},
-                ],
-            },
-            {
-                "duration_days": 4 * 14,
-                "drugs": [
-                    {"pk_name": "paclitaxel", "dose": 175, "unit": "mg/m2", "interval": "q2w"},
-                    {"pk_name": "trastuzumab_sc", "dose": 600, "unit": "mg", "interval": "q2w"},
-                ],
-            },
-        ],
-    },
-    "АС × 4 → (таксаны+ трастузумаб + пертузумаб) × 4": {
-        "type": "phased",
-        "phases": [
-            {
-                "duration_days": 4 * 21,
-                "drugs": [
-                    {"pk_name": "doxorubicin", "dose": 60, "unit": "mg/m2", "interval": "q3w"},
-                    {"pk_name": "cyclophosphamide", "dose": 600, "unit": "mg/m2", "interval": "q3w"},
-                ],
-            },
-            {
-                "duration_days": 4 * 21,
-                "drugs": [
-                    {"pk_name": "docetaxel", "dose": 75, "unit": "mg/m2", "interval": "q3w"},
-                    {"pk_name": "trastuzumab_sc", "dose": 600, "unit": "mg", "interval": "q3w"},
-                    {"pk_name": "pertuzumab", "dose": 420, "unit": "mg", "interval": "q3w"},
-                ],
-            },
-        ],
-    },
-    "Трастузумаб эмтанзин × 14": {
-        "type": "simple",
-        "drugs": [
-            {
-                "pk_name": "trastuzumab_emtansine",
-                "dose": 3.6,
-                "unit": "mg/m2",
-                "interval": "q3w",
-                "n_cycles": 14,
-            }
-        ],
-    },
-
-
-    "ddАС × 4 → ddP × 4 АС": {
-        "type": "phased",
-        "phases": [
-            {
-                "duration_days": 4 * 14,
-                "drugs": [
-                    {"pk_name": "doxorubicin", "dose": 60, "unit": "mg/m2", "interval": "q2w"},
-                    {"pk_name": "cyclophosphamide", "dose": 600, "unit": "mg/m2", "interval": "q2w"},
-                ],
-            },
-            {
-                "duration_days": 4 * 14,
-                "drugs": [
-                    {"pk_name": "paclitaxel", "dose": 175, "unit": "mg/m2", "interval": "q2w"},
-                ],
-            },
-        ],
-    },
-    "ddАC × 4 → P × 12 АС": {
-        "type": "phased",
-        "phases": [
-            {
-                "duration_days": 4 * 14,
-                "drugs": [
-                    {"pk_name": "doxorubicin", "dose": 60, "unit": "mg/m2", "interval": "q2w"},
-                    {"pk_name": "cyclophosphamide", "dose": 600, "unit": "mg/m2", "interval": "q2w"},
-                ],
-            },
-            {
-                "duration_days": 12 * 7,
-                "drugs": [
-                    {"pk_name": "paclitaxel", "dose": 80, "unit": "mg/m2", "interval": "weekly"},
-                ],
-            },
-        ],
-    },
-    "ddАC × 4 → P + С × 12 АС": {
-        "type": "phased",
-        "phases": [
-            {
-                "duration_days": 4 * 14,
-                "drugs": [
-                    {"pk_name": "doxorubicin", "dose": 60, "unit": "mg/m2", "interval": "q2w"},
-                    {"pk_name": "cyclophosphamide", "dose": 600, "unit": "mg/m2", "interval": "q2w"},
-                ],
-            },
-            {
-                "duration_days": 12 * 7,
-                "drugs": [
-                    {"pk_name": "paclitaxel", "dose": 80, "unit": "mg/m2", "interval": "weekly"},
-                    {"pk_name": "carboplatin", "dose": 300, "unit": "mg/m2", "interval": "weekly"},
-                ],
-            },
-        ],
-    },
-    "DC × 4–6": {
-        "type": "simple",
-        "drugs": [
-            {
-                "pk_name": "docetaxel",
-                "dose": 75,
-                "unit": "mg/m2",
-                "interval": "q3w",
-                "n_cycles": 6,
-            },
-            {
-                "pk_name": "cyclophosphamide",
-                "dose": 600,
-                "unit": "mg/m2",
-                "interval": "q3w",
-                "n_cycles": 6,
-            },
-        ],
-    },
-    "AC × 4": {
-        "type": "simple",
-        "drugs": [
-            {
-                "pk_name": "doxorubicin",
-                "dose": 60,
-                "unit": "mg/m2",
-                "interval": "q3w",
-                "n_cycles": 4,
-            },
-            {
-                "pk_name": "cyclophosphamide",
-                "dose": 600,
-                "unit": "mg/m2",
-                "interval": "q3w",
-                "n_cycles": 4,
-            },
-        ],
-    },
-    "AC × 4 → D × 4": {
-        "type": "phased",
-        "phases": [
-            {
-                "duration_days": 4 * 21,
-                "drugs": [
-                    {"pk_name": "doxorubicin", "dose": 60, "unit": "mg/m2", "interval": "q3w"},
-                    {"pk_name": "cyclophosphamide", "dose": 600, "unit": "mg/m2", "interval": "q3w"},
-                ],
-            },
-            {
-                "duration_days": 4 * 21,
-                "drugs": [
-                    {"pk_name": "docetaxel", "dose": 75, "unit": "mg/m2", "interval": "q3w"},
-                ],
-            },
-        ],
-    },
-    "AC × 4 → P × 12": {
-        "type": "phased",
-        "phases": [
-            {
-                "duration_days": 4 * 21,
-                "drugs": [
-                    {"pk_name": "doxorubicin", "dose": 60, "unit": "mg/m2", "interval": "q3w"},
-                    {"pk_name": "cyclophosphamide", "dose": 600, "unit": "mg/m2", "interval": "q3w"},
-                ],
-            },
-            {
-                "duration_days": 12 * 7,
-                "drugs": [
-                    {"pk_name": "paclitaxel", "dose": 80, "unit": "mg/m2", "interval": "weekly"},
-                ],
-            },
-        ],
-    },
-    "Капецитабин (монотерапия)": {
-        "type": "simple",
-        "drugs": [
-            {
-                "pk_name": "capecitabine",
-                "dose": 2000,
-                "unit": "mg/m2",
-                "interval": "q3w",  
-                "n_cycles": 8,
-            }
-        ],
-    },
-    "Олапариб": {
-        "type": "simple",
-        "drugs": [
-            {
-                "pk_name": "olaparib",
-                "dose": 600,
-                "unit": "mg",
-                "interval": "daily",
-                "n_cycles": 365,
-            }
-        ],
-    },
-}
 
+def regimen_drug_effect(reg, C):
+    """Суммарный эффект E(C) по препаратам схемы для концентраций C [n_drugs, ...]"""
+    E_max = np.array([PK_PD_PARAMS[name]["E_max"] for name in reg.drugs])
+    EC50 = np.array([PK_PD_PARAMS[name]["EC50"] for name in reg.drugs])
+    shape = (-1,) + (1,) * (C.ndim - 1)
+    return E_of_C(C, E_max.reshape(shape), EC50.reshape(shape)).sum(axis=0)
 
-INTERVAL_TO_DAYS = {
-    "q3w": 21.0,
-    "q2w": 14.0,
-    "weekly": 7.0,
-    "daily": 1.0,
-    "q4w": 28.0,
-    "q6m": 180.0,
-}
 
 
 def get_regimen_length_days_from_frontend(regimen_name):
-
-    reg = FRONTEND_REGIMENS[regimen_name]
-    rtype = reg["type"]
-
-    if rtype == "simple":
-        max_len = 0.0
-        for d in reg["drugs"]:
-            interval = d["interval"]
-            n_cycles = d.get("n_cycles", 1)
-            dt = INTERVAL_TO_DAYS.get(interval, 21.0)
-            max_len = max(max_len, n_cycles * dt)
-        if max_len <= 0:
-            max_len = 365.0
-        return max_len
-
-    elif rtype == "phased":
-        total = 0.0
-        for phase in reg["phases"]:
-            total += float(phase["duration_days"])
-        if total <= 0:
-            total = 365.0
-        return total
-
-    else:
-        return 365.0
+    return get_regimen(regimen_name).horizon
 
 
 
@@ -797,14 +393,31 @@ def tumor_ode_resistant(t, y,
     return [dNsdt, dNrdt, dNdt]
 
 
-def simulate_patient_resistant(subtype,
-                               ki67_percent,
-                               V0,
-                               drug_effect_func,
-                               t_end=365.0,
-                               mutation_rate=0.01,
-                               resistance_strength=0.5,
-                               bsa=1.7):
+# ограничение шага интегратора, чтобы он не перешагивал импульсы введения препаратов, дни
+TUMOR_MAX_STEP = 1.0
+
+
+def final_volume_lower_bound(V, t, t_end, r, K, k_clear):
+    """
+    Нижняя оценка V(t_end) по состоянию в момент t, не зависящая от препаратов.
+
+    Гибель клеток от препарата переводит объём из U в N и не меняет V, поэтому
+    dV/dt = r*U*(1 - V/K) - k_clear*N >= -lam*V, где lam = k_clear + r*max(0, M/K - 1),
+    M = max(V, K) — верхняя граница V на оставшемся интервале.
+    """
+    lam = k_clear + r * max(0.0, max(V, K) / K - 1.0)
+    return V * np.exp(-lam * (t_end - t))
+
+
+def _solve_tumor(subtype,
+                 ki67_percent,
+                 V0,
+                 drug_effect_func,
+                 t_end,
+                 mutation_rate,
+                 resistance_strength,
+                 max_step,
+                 stop_above=None):
 
     if subtype not in params_pop:
         raise ValueError(f"Неизвестный подтип {subtype}")
@@ -827,7 +440,19 @@ def simulate_patient_resistant(subtype,
     N0 = f_N0 * V0
     y0 = [Ns0, Nr0, N0]
 
-    sol = solve_ivp(
+    events = None
+    if stop_above is not None:
+        # оценка превышена уже в начале: событие не сработает, симулировать нечего
+        if final_volume_lower_bound(V0, 0.0, t_end, r, K, k_clear) > stop_above:
+            return None
+
+        def exceeds_bound(tt, yy):
+            return final_volume_lower_bound(np.sum(yy), tt, t_end, r, K, k_clear) - stop_above
+        exceeds_bound.terminal = True
+        exceeds_bound.direction = 1.0
+        events = [exceeds_bound]
+
+    return solve_ivp(
         lambda tt, yy: tumor_ode_resistant(
             tt, yy,
             r=r, K=K,
@@ -839,19 +464,106 @@ def simulate_patient_resistant(subtype,
         [0.0, t_end],
         y0,
         t_eval=t_eval,
+        max_step=max_step,
+        events=events,
     )
 
+
+def simulate_patient_resistant(subtype,
+                               ki67_percent,
+                               V0,
+                               drug_effect_func,
+                               t_end=365.0,
+                               mutation_rate=0.01,
+                               resistance_strength=0.5,
+                               bsa=DEFAULT_BSA,
+                               max_step=TUMOR_MAX_STEP):
+
+    sol = _solve_tumor(subtype, ki67_percent, V0, drug_effect_func, t_end,
+                       mutation_rate, resistance_strength, max_step)
+
     Ns, Nr, N = sol.y
     V = Ns + Nr + N
-    return t_eval, V, Ns, Nr, N
+    return sol.t, V, Ns, Nr, N
+
+
+
+def simulate_patients_batch(r, K, d_base, k_clear, f_N0, V0,
+                            effect_grid,
+                            t_end,
+                            mutation_rate=0.01,
+                            resistance_strength=0.5,
+                            n_out=50):
+    """
+    Векторная симуляция пакета пациентов методом РК4 с фиксированным шагом.
+
+    Args:
+        r, K, d_base, k_clear, f_N0, V0: скаляры или массивы [B]
+        effect_grid: суммарный эффект препаратов на сетке pk_time_grid(t_end),
+            [n_t] (общий для всех) или [B, n_t]
+        t_end: горизонт, дни
+        n_out: число точек выходной сетки, как t_eval в simulate_patient_resistant
+
+    Returns:
+        t_eval [n_out] и V, Ns, Nr, N формы [B, n_out]
+    """
+    effect_grid = np.atleast_2d(effect_grid)
+    r, K, d_base, k_clear, f_N0, V0 = np.broadcast_arrays(
+        *(np.asarray(x, dtype=float) for x in (r, K, d_base, k_clear, f_N0, V0, effect_grid[:, 0]))
+    )[:6]
+
+    # шаг РК4 равен двум шагам сетки препаратов: середина шага попадает в её узел
+    h = 2.0 * PK_GRID_STEP
+    n_steps = int(np.ceil(t_end / h))
+
+    U0 = (1.0 - f_N0) * V0
+    y = np.stack([U0 * 0.95, U0 * 0.05, f_N0 * V0])
+    states = np.empty((n_steps + 1,) + y.shape)
+    states[0] = y
+
+    def rhs(y, e):
+        return np.array(tumor_ode_resistant(
+            0.0, y,
+            r=r, K=K,
+            d_base=d_base, k_clear=k_clear,
+            drug_effect_func=lambda _t: e,
+            mutation_rate=mutation_rate,
+            resistance_strength=resistance_strength,
+        ))
+
+    for k in range(n_steps):
+        e0, e_mid, e1 = effect_grid[:, 2 * k], effect_grid[:, 2 * k + 1], effect_grid[:, 2 * k + 2]
+        k1 = rhs(y, e0)
+        k2 = rhs(y + 0.5 * h * k1, e_mid)
+        k3 = rhs(y + 0.5 * h * k2, e_mid)
+        k4 = rhs(y + h * k3, e1)
+        y = y + (h / 6.0) * (k1 + 2.0 * k2 + 2.0 * k3 + k4)
+        states[k + 1] = y
+
+    t_eval = np.linspace(0.0, t_end, n_out)
+    pos = t_eval / h
+    i0 = np.minimum(pos.astype(int), n_steps - 1)
+    w = (pos - i0)[:, None, None]
+    out = states[i0] * (1.0 - w) + states[i0 + 1] * w
+
+    Ns, Nr, N = out[:, 0].T, out[:, 1].T, out[:, 2].T
+    return t_eval, Ns + Nr + N, Ns, Nr, N
 
 
 
 DEFAULT_DOSE_SCALES = [0.7, 0.85, 1.0, 1.15, 1.3]
 
+# меняется вместе с численной схемой симуляции: сбрасывает предрасчитанные таблицы
+SIMULATION_VERSION = 5
 
-def _compute_absolute_dose(base_dose, unit, scale):
-    return base_dose * scale
+
+def _compute_absolute_dose(base_dose, unit, scale, bsa=DEFAULT_BSA):
+    """Абсолютная доза, мг: дозы в mg/m2 умножаются на площадь поверхности тела"""
+    if unit == "mg/m2":
+        return base_dose * scale * bsa
+    if unit == "mg":
+        return base_dose * scale
+    raise ValueError(f"Неизвестная единица дозы {unit}")
 
 
 
@@ -867,116 +579,72 @@ def to_diameter_from_volume(V):
 def make_drug_effect_from_frontend(regimen_name,
                                    dose_multipliers,
                                    t_end,
-                                   bsa=1.7):
-
-    if regimen_name not in FRONTEND_REGIMENS:
-        raise ValueError(f"Схема {regimen_name} не найдена во FRONTEND_REGIMENS")
-
-    reg = FRONTEND_REGIMENS[regimen_name]
-    rtype = reg["type"]
-
-    pk_list = [] 
-
-    if rtype == "simple":
-        for d in reg["drugs"]:
-            pk_name = d["pk_name"]
-            base_dose = d["dose"]
-            unit = d["unit"]
-            interval = d["interval"]
-
-            scale = dose_multipliers.get(pk_name, 1.0)
-            dose_abs = _compute_absolute_dose(base_dose, unit, scale)
-
-            C_func, E_max, EC50 = build_single_drug_pkpd(
-                drug_name=pk_name,
-                t_end=t_end,
-                bsa=bsa,
-                dose_abs_override=dose_abs,
-                schedule_override=interval,
-            )
-            pk_list.append((C_func, E_max, EC50))
-
-    elif rtype == "phased":
-        t_shift = 0.0
-        for phase in reg["phases"]:
-            duration = float(phase["duration_days"])
-            for d in phase["drugs"]:
-                pk_name = d["pk_name"]
-                base_dose = d["dose"]
-                unit = d["unit"]
-                interval = d["interval"]
-
-                scale = dose_multipliers.get(pk_name, 1.0)
-                dose_abs = _compute_absolute_dose(base_dose, unit, scale)
-
-                C_phase, E_max, EC50 = build_single_drug_pkpd(
-                    drug_name=pk_name,
-                    t_end=duration,
-                    bsa=bsa,
-                    dose_abs_override=dose_abs,
-                    schedule_override=interval,
-                )
-
-                def make_shifted(C_local, shift):
-                    def C_global(t):
-                        tau = t - shift
-                        if tau < 0:
-                            return 0.0
-                        return float(C_local(max(tau, 0.0)))
-                    return C_global
-
-                C_shifted = make_shifted(C_phase, t_shift)
-                pk_list.append((C_shifted, E_max, EC50))
-
-            t_shift += duration
-    else:
-        raise ValueError(f"Неизвестный тип схемы {rtype}")
+                                   bsa=DEFAULT_BSA):
+
+    reg = get_regimen(regimen_name)
+
+    t_grid = pk_time_grid(t_end)
+    C = regimen_concentrations(reg, dose_multipliers, t_grid, bsa=bsa)
+    effect = regimen_drug_effect(reg, C)
 
     def drug_effect(t):
-        total = 0.0
-        for C_func, E_max, EC50 in pk_list:
-            C = float(C_func(t))
-            total += E_of_C(C, E_max, EC50)
-        return total
+        return float(np.interp(t, t_grid, effect))
 
     return drug_effect
 
 
 
+# запас для раннего выхода: комбинация отбрасывается, только если нижняя оценка
+# V(t_end) выше лучшего результата с учётом погрешности интегратора
+EARLY_EXIT_MARGIN = 1e-2
+
+
+def _dose_lattice(pk_names, dose_scales):
+    """Узлы решётки множителей в порядке убывания суммарной дозы с индексом в порядке product"""
+    combos = list(enumerate(product(dose_scales, repeat=len(pk_names))))
+    return sorted(combos, key=lambda ic: (-sum(ic[1]), ic[0]))
+
+
 def optimize_frontend_regimen(regimen_name,
                               subtype,
                               ki67_percent,
                               V0,
-                              bsa=1.7,
+                              bsa=DEFAULT_BSA,
                               dose_scales=None,
                               objective="min_final_volume",
                               mutation_rate=0.01,
-                              resistance_strength=0.5):
+                              resistance_strength=0.5,
+                              early_exit=True):
+    """
+    Перебор множителей доз по решётке dose_scales
 
-    if dose_scales is None:
-        dose_scales = DEFAULT_DOSE_SCALES
+    Препараты из reg.fixed_drugs (гормонотерапия в комбинированной схеме) идут
+    со множителем 1 и в решётку не входят.
 
-    reg = FRONTEND_REGIMENS[regimen_name]
-    rtype = reg["type"]
+    Args:
+        early_exit: останавливать симуляцию (событие solve_ivp), как только нижняя оценка
+            V(t_end) превысила лучший результат; только для objective="min_final_volume"
 
-    pk_names = []
-    if rtype == "simple":
-        for d in reg["drugs"]:
-            if d["pk_name"] not in pk_names:
-                pk_names.append(d["pk_name"])
-    else:
-        for phase in reg["phases"]:
-            for d in phase["drugs"]:
-                if d["pk_name"] not in pk_names:
-                    pk_names.append(d["pk_name"])
+    Returns:
+        лучший результат; в "pruning" — счётчики и журнал ранних выходов
+    """
+    if dose_scales is None:
+        dose_scales = DEFAULT_DOSE_SCALES
 
-    t_end = get_regimen_length_days_from_frontend(regimen_name)
+    reg = get_regimen(regimen_name)
+    pk_names = [d for d in reg.drugs if d not in reg.fixed_drugs]
+    fixed = dict.fromkeys(reg.fixed_drugs, 1.0)
+    t_end = reg.horizon
+    early_exit = early_exit and objective == "min_final_volume"
 
-    best_score = np.inf
+    best_key = (np.inf, -1)
     best_result = None
+    simulated = 0
+    pruning_log = []
+    ode_nfev = 0
 
-    for combo in product(dose_scales, repeat=len(pk_names)):
-        dose_multipliers = dict(zip(pk_names, combo))
+    for index, combo in _dose_lattice(pk_names, dose_scales):
+        dose_multipliers = fixed | dict(zip(pk_names, combo))
 
         drug_eff = make_drug_effect_from_frontend(
             regimen_name=regimen_name,
@@ -985,25 +653,38 @@ def optimize_frontend_regimen(regimen_name,
             bsa=bsa,
         )
 
-        t, V, Ns, Nr, N = simulate_patient_resistant(
-            subtype=subtype,
-            ki67_percent=ki67_percent,
-            V0=V0,
-            drug_effect_func=drug_eff,
-            t_end=t_end,
-            mutation_rate=mutation_rate,
-            resistance_strength=resistance_strength,
-            bsa=bsa,
-        )
+        stop_above = None
+        if early_exit and best_result is not None:
+            stop_above = best_key[0] * (1.0 + EARLY_EXIT_MARGIN)
+
+        sol = _solve_tumor(subtype, ki67_percent, V0, drug_eff, t_end,
+                           mutation_rate, resistance_strength, TUMOR_MAX_STEP,
+                           stop_above=stop_above)
+        simulated += 1
+        if sol is not None:
+            ode_nfev += sol.nfev
 
+        if sol is None or sol.status == 1:
+            pruning_log.append({
+                "dose_multipliers": dose_multipliers,
+                "reason": "early_exit",
+                "t_stop": 0.0 if sol is None else float(sol.t_events[0][0]),
+                "bound": stop_above,
+                "best_score": float(best_key[0]),
+            })
+            continue
+
+        Ns, Nr, N = sol.y
+        V = Ns + Nr + N
         score = V[-1] if objective == "min_final_volume" else np.min(V)
 
-        if score < best_score:
-            best_score = score
+        # при равенстве побеждает комбинация, идущая раньше в порядке product, как при полном переборе
+        if (score, index) < best_key:
+            best_key = (score, index)
             best_result = {
                 "regimen_name": regimen_name,
                 "dose_multipliers": dose_multipliers,
-                "t": t,
+                "t": sol.t,
                 "V": V,
                 "Ns": Ns,
                 "Nr": Nr,
@@ -1012,18 +693,184 @@ def optimize_frontend_regimen(regimen_name,
                 "t_end": t_end,
             }
 
+    if best_result is not None:
+        best_result["pruning"] = {
+            "combos": len(dose_scales) ** len(pk_names),
+            "simulated": simulated,
+            "ode_nfev": ode_nfev,
+            "early_exit": sum(1 for e in pruning_log if e["reason"] == "early_exit"),
+            "log": pruning_log,
+        }
     return best_result
 
 
+def _tumor_sensitivity_rhs(y, S, e, de, r, K, d_base, k_clear, mutation_rate, resistance_strength):
+    """
+    Прямые уравнения чувствительности к множителям доз: S' = J S + (df/de) * de/dm
+
+    Args:
+        y: состояние [Ns, Nr, N]
+        S: чувствительности [3, n_drugs]
+        e: суммарный эффект препаратов в момент t
+        de: производные эффекта по множителям [n_drugs]
+    """
+    Ns, Nr, N = y
+    rho = resistance_strength
+    g = 1.0 - (Ns + Nr + N) / K
+
+    J = np.array([
+        [r * g - r * Ns / K - (d_base + e) - mutation_rate, -r * Ns / K, -r * Ns / K],
+        [-r * Nr / K + mutation_rate, r * g - r * Nr / K - (d_base + rho * e), -r * Nr / K],
+        [d_base + e, d_base + rho * e, -k_clear],
+    ])
+    df_de = np.array([-Ns, -rho * Nr, Ns + rho * Nr])
+    return J @ S + np.outer(df_de, de)
+
+
+def final_volume_and_gradient(regimen_name,
+                              subtype,
+                              ki67_percent,
+                              V0,
+                              dose_multipliers,
+                              bsa=DEFAULT_BSA,
+                              mutation_rate=0.01,
+                              resistance_strength=0.5,
+                              base_concentrations=None):
+    """
+    V(t_end) и dV(t_end)/d(множители) одним решением расширенной системы
+
+    Концентрации линейны по дозе (C_i = m_i * c_i), поэтому de/dm_i = E_i'(m_i c_i) * c_i
+    считается на сетке PK без дополнительных решений. Система интегрируется той же
+    схемой, что simulate_patients_batch: РК4 с шагом в два узла сетки PK, эффект
+    берётся в узлах без интерполяции. РК4 для расширенной системы даёт точную
+    производную дискретного V(t_end), так что градиент согласован с целевой функцией.
+
+    Returns:
+        V(t_end), градиент [n_drugs] в порядке reg.drugs
+    """
+    if subtype not in params_pop:
+        raise ValueError(f"Неизвестный подтип {subtype}")
+
+    reg = get_regimen(regimen_name)
+    pop = params_pop[subtype]
+    r = r_from_ki67(ki67_percent / 100.0, T_cycle_dict[subtype])
+    K, d_base, k_clear, f_N0 = pop["K"], pop["d"], pop["k_clear"], pop["f_N0"]
+
+    t_end = reg.horizon
+    t_grid = pk_time_grid(t_end)
+    c = base_concentrations
+    if c is None:
+        c = regimen_concentrations(reg, {}, t_grid, bsa=bsa)
+
+    m = np.array([dose_multipliers.get(name, 1.0) for name in reg.drugs])
+    E_max = np.array([PK_PD_PARAMS[name]["E_max"] for name in reg.drugs])[:, None]
+    EC50 = np.array([PK_PD_PARAMS[name]["EC50"] for name in reg.drugs])[:, None]
+    C = m[:, None] * c
+    effect = E_of_C(C, E_max, EC50).sum(axis=0)
+    d_effect = E_max * EC50 / (C + EC50 + 1e-12) ** 2 * c
+
+    n_drugs = len(reg.drugs)
+    U0 = (1.0 - f_N0) * V0
+    y = np.array([U0 * 0.95, U0 * 0.05, f_N0 * V0])
+    S = np.zeros((3, n_drugs))
+
+    def rhs(y, S, node):
+        e = effect[node]
+        dy = np.array(tumor_ode_resistant(
+            0.0, y,
+            r=r, K=K,
+            d_base=d_base, k_clear=k_clear,
+            drug_effect_func=lambda _t: e,
+            mutation_rate=mutation_rate,
+            resistance_strength=resistance_strength,
+        ))
+        dS = _tumor_sensitivity_rhs(y, S, e, d_effect[:, node], r, K, d_base, k_clear,
+                                    mutation_rate, resistance_strength)
+        return dy, dS
+
+    h = 2.0 * PK_GRID_STEP
+    for k in range(int(np.ceil(t_end / h))):
+        k1, l1 = rhs(y, S, 2 * k)
+        k2, l2 = rhs(y + 0.5 * h * k1, S + 0.5 * h * l1, 2 * k + 1)
+        k3, l3 = rhs(y + 0.5 * h * k2, S + 0.5 * h * l2, 2 * k + 1)
+        k4, l4 = rhs(y + h * k3, S + h * l3, 2 * k + 2)
+        y = y + (h / 6.0) * (k1 + 2.0 * k2 + 2.0 * k3 + k4)
+        S = S + (h / 6.0) * (l1 + 2.0 * l2 + 2.0 * l3 + l4)
+    return float(y.sum()), S.sum(axis=0)
+
+
+def optimize_frontend_regimen_continuous(regimen_name,
+                                         subtype,
+                                         ki67_percent,
+                                         V0,
+                                         bsa=DEFAULT_BSA,
+                                         dose_bounds=None,
+                                         mutation_rate=0.01,
+                                         resistance_strength=0.5):
+    """
+    Непрерывный подбор множителей доз (L-BFGS-B) по градиенту V(t_end)
+
+    Args:
+        dose_bounds: (min, max) множителя; по умолчанию — границы DEFAULT_DOSE_SCALES;
+            множители reg.fixed_drugs закреплены на 1
+
+    Returns:
+        результат в формате optimize_frontend_regimen плюс "nfev" и "nit"
+    """
+    reg = get_regimen(regimen_name)
+    lo, hi = dose_bounds or (min(DEFAULT_DOSE_SCALES), max(DEFAULT_DOSE_SCALES))
+    t_end = reg.horizon
+    base = regimen_concentrations(reg, {}, pk_time_grid(t_end), bsa=bsa)
+
+    def fun(x):
+        return final_volume_and_gradient(
+            regimen_name, subtype, ki67_percent, V0, dict(zip(reg.drugs, x)),
+            bsa=bsa, mutation_rate=mutation_rate, resistance_strength=resistance_strength,
+            base_concentrations=base,
+        )
+
+    opt = minimize(fun, x0=np.ones(len(reg.drugs)), jac=True, method="L-BFGS-B",
+                   bounds=[(1.0, 1.0) if d in reg.fixed_drugs else (lo, hi) for d in reg.drugs])
+
+    dose_multipliers = {name: float(x) for name, x in zip(reg.drugs, opt.x)}
+    # траектория той же схемой РК4, что и целевая функция: score совпадает с минимумом
+    pop = params_pop[subtype]
+    t, V, Ns, Nr, N = simulate_patients_batch(
+        r=r_from_ki67(ki67_percent / 100.0, T_cycle_dict[subtype]),
+        K=pop["K"],
+        d_base=pop["d"],
+        k_clear=pop["k_clear"],
+        f_N0=pop["f_N0"],
+        V0=V0,
+        effect_grid=regimen_drug_effect(reg, opt.x[:, None] * base),
+        t_end=t_end,
+        mutation_rate=mutation_rate,
+        resistance_strength=resistance_strength,
+    )
+    return {
+        "regimen_name": regimen_name,
+        "dose_multipliers": dose_multipliers,
+        "t": t,
+        "V": V[0],
+        "Ns": Ns[0],
+        "Nr": Nr[0],
+        "N": N[0],
+        "score": V[0, -1],
+        "t_end": t_end,
+        "nfev": int(opt.nfev),
+        "nit": int(opt.nit),
+    }
+
+
 def summarize_and_plot_frontend_result(result,
                                        subtype,
                                        ki67_percent,
                                        V0,
-                                       bsa=1.7,
+                                       bsa=DEFAULT_BSA,
                                        plot=True):
 
     if result is None:
-        print("❌ Не удалось найти ни одной допустимой комбинации доз.")
+        logger.warning("Не удалось найти ни одной допустимой комбинации доз")
         return
 
     regimen_name = result["regimen_name"]
@@ -1034,39 +881,18 @@ def summarize_and_plot_frontend_result(result,
     Nr = np.array(result["Nr"])
     N = np.array(result["N"])
 
-    reg = FRONTEND_REGIMENS[regimen_name]
-    rtype = reg["type"]
-
-    print("\n" + "=" * 70)
-    print(f"СХЕМА: {regimen_name}")
-    print("=" * 70)
-    print(f"Подтип: {subtype}, Ki-67: {ki67_percent}%")
-
-    print("\nПрепараты и оптимальные дозы:")
-    printed = set()
-
-    def print_drug(pk_name, base_dose, unit, interval):
-        if pk_name in printed:
-            return
-        printed.add(pk_name)
-        scale = dose_multipliers.get(pk_name, 1.0)
-        dose_opt = base_dose * scale
-        abs_opt = _compute_absolute_dose(base_dose, unit, scale)
-        print(
-            f" • {pk_name}: базовая доза {base_dose} {unit}, "
+    logger.info(f"Схема {regimen_name}: подтип {subtype}, Ki-67 {ki67_percent}%")
+    for d in get_regimen(regimen_name).drug_info:
+        scale = dose_multipliers.get(d.pk_name, 1.0)
+        dose_opt = d.dose * scale
+        abs_opt = _compute_absolute_dose(d.dose, d.unit, scale, bsa)
+        logger.bind(regimen=regimen_name, drug=d.pk_name, multiplier=scale).info(
+            f"{d.pk_name}: базовая доза {d.dose} {d.unit}, "
             f"множитель {scale:.2f}, "
-            f"номинальная {dose_opt:.1f} {unit}, "
-            f"абсолютная ~{abs_opt:.1f} mg, интервал {interval}"
+            f"номинальная {dose_opt:.1f} {d.unit}, "
+            f"абсолютная ~{abs_opt:.1f} mg, интервал {d.interval}"
         )
 
-    if rtype == "simple":
-        for d in reg["drugs"]:
-            print_drug(d["pk_name"], d["dose"], d["unit"], d["interval"])
-    elif rtype == "phased":
-        for phase in reg["phases"]:
-            for d in phase["drugs"]:
-                print_drug(d["pk_name"], d["dose"], d["unit"], d["interval"])
-
     if plot:
         plt.figure(figsize=(10, 6))
         plt.plot(t, V, label="V(t) = Ns + Nr + N", linewidth=2)
@@ -1081,84 +907,74 @@ def summarize_and_plot_frontend_result(result,
         plt.tight_layout()
         plt.show()
 
-    print("=" * 70 + "\n")
-
 
-def run_simulation(params: dict) -> dict:
+def run_simulation(params: dict) -> SimulationResult:
 
     subtype = params["subtype"]
     ki67 = params["ki67"]
     tumor_size_cm = params["tumor_size_cm"]
     regimen = params["regimen"]
+    bsa = bucket_bsa(params.get("bsa", DEFAULT_BSA))
 
     V0 = to_volume_from_diameter(tumor_size_cm)
 
-    best = optimize_frontend_regimen(
+    # "grid" — перебор DEFAULT_DOSE_SCALES, "continuous" — L-BFGS-B по градиенту V(t_end)
+    optimizer = optimize_frontend_regimen
+    if params.get("dose_search", "grid") == "continuous":
+        optimizer = optimize_frontend_regimen_continuous
+
+    started = time.perf_counter()
+    best = optimizer(
         regimen_name=regimen,
         subtype=subtype,
         ki67_percent=ki67,
         V0=V0,
+        bsa=bsa,
     )
+    stats = optimizer_stats(best, time.perf_counter() - started)
 
     if best is None:
-        return {
-            "ok": False,
-            "t": None,
-            "V": None,
-            "Ns": None,
-            "Nr": None,
-            "N": None
-        }
-    
-    result = {
-        "ok": True,
-        "t": best["t"].tolist(),
-        "V": best["V"].tolist(),
-        "Ns": best["Ns"].tolist(),
-        "Nr": best["Nr"].tolist(),
-        "N": best["N"].tolist()
-    }
+        return SimulationResult.failure(f"Не найдено допустимой комбинации доз для схемы {regimen}", stats)
 
-    regimen_info = FRONTEND_REGIMENS[regimen]
-    rtype = regimen_info["type"]
-
-    base_doses = {}
-    base_units = {}
-    intervals = {}
-
-    if rtype == "simple":
-        for d in regimen_info["drugs"]:
-            pk = d["pk_name"]
-            base_doses[pk] = d["dose"]
-            base_units[pk] = d["unit"]
-            intervals[pk] = d["interval"]
-
-    elif rtype == "phased":
-        seen = set()
-        for ph in regimen_info["phases"]:
-            for d in ph["drugs"]:
-                pk = d["pk_name"]
-                if pk not in seen:
-                    seen.add(pk)
-                    base_doses[pk] = d["dose"]
-                    base_units[pk] = d["unit"]
-                    intervals[pk] = d["interval"]
+    return format_simulation_result(regimen, best, stats)
 
-    final_doses = {}
 
-    for pk in base_doses.keys():
-        m = best["dose_multipliers"][pk]    
-        base = base_doses[pk]
-        optimized = base * m               
+def optimizer_stats(best, seconds) -> dict:
+    """Счётчики оптимизатора для журнала запросов"""
+    stats = {"optimize_ms": round(seconds * 1000.0, 1)}
+    if best is None:
+        return stats
+    if "pruning" in best:
+        stats["combos"] = best["pruning"]["combos"]
+        stats["simulated"] = best["pruning"]["simulated"]
+        # для перебора по сетке nfev — вызовы правой части ОДУ, для L-BFGS-B — вычисления цели
+        stats["nfev"] = best["pruning"]["ode_nfev"]
+    if "nit" in best:
+        stats["nfev"] = best["nfev"]
+        stats["nit"] = best["nit"]
+    return stats
 
-        final_doses[pk] = {
-            "base_dose": base,
-            "optimized_dose": optimized,
-        }
 
-    result["doses"] = final_doses
+def format_simulation_result(regimen_name, best, stats=None) -> SimulationResult:
 
-    return result
+    final_doses = {}
+
+    for d in get_regimen(regimen_name).drug_info:
+        m = best["dose_multipliers"][d.pk_name]
+        final_doses[d.pk_name] = {
+            "base_dose": d.dose,
+            "optimized_dose": d.dose * m,
+        }
+
+    return SimulationResult.from_trajectories(
+        final_doses,
+        stats=stats,
+        t=best["t"],
+        V=best["V"],
+        Ns=best["Ns"],
+        Nr=best["Nr"],
+        N=best["N"],
+    )
 
 
 def subtype_from_markers(er_status: bool, pr_status: bool, her2_status: bool) -> str:
@@ -0,0 +1,218 @@
+"""
+Многокритериальный подбор доз: эффективность против токсичности.
+
+Однокритериальный перебор всегда уходит к максимальному множителю. Здесь все
+комбинации решётки dose_scales считаются одним пакетом simulate_patients_batch,
+из тех же концентраций берётся прокси токсичности — суммарная по препаратам
+AUC с весом TOXICITY_WEIGHTS, в единицах AUC трёх недель стандартной дозы, —
+и возвращается фронт Парето по паре (V(t_end), токсичность).
+
+Массив концентраций [n_drugs, B, n_t] целиком не строится: AUC линейна по
+дозе и берётся из AUC стандартной дозы, а эффект и симуляция считаются
+кусками по PARETO_CHUNK_SIZE комбинаций. Решётки больше MAX_PARETO_COMBOS
+отклоняются.
+"""
+from itertools import product
+
+import numpy as np
+
+from src.math_models.core import (
+    DEFAULT_BSA,
+    DEFAULT_DOSE_SCALES,
+    E_of_C,
+    PK_PD_PARAMS,
+    T_cycle_dict,
+    bucket_bsa,
+    params_pop,
+    pk_time_grid,
+    r_from_ki67,
+    regimen_concentrations,
+    simulate_patients_batch,
+    to_volume_from_diameter,
+)
+from src.math_models.regimens import INTERVAL_TO_DAYS, get_regimen
+
+# комбинаций в одном пакете simulate_patients_batch: ограничивает память на длинных горизонтах
+PARETO_CHUNK_SIZE = 256
+# 5 множителей на 5 подбираемых препаратов — самая большая стандартная схема
+MAX_PARETO_COMBOS = 3125
+
+# относительная тяжесть токсичности на AUC трёх недель стандартной дозы:
+# антрациклины (кардиотоксичность) и платина/таксаны тяжелее, антитела и гормоны легче
+TOXICITY_WEIGHTS = {
+    "doxorubicin": 1.5,
+    "docetaxel": 1.2,
+    "carboplatin": 1.2,
+    "paclitaxel": 1.0,
+    "cyclophosphamide": 1.0,
+    "trastuzumab_emtansine": 1.0,
+    "capecitabine": 0.8,
+    "olaparib": 0.6,
+    "trastuzumab_sc": 0.3,
+    "pertuzumab": 0.3,
+    "letrozole": 0.1,
+    "anastrozole": 0.1,
+    "tamoxifen": 0.1,
+    "toremifene": 0.1,
+    "fulvestrant": 0.1,
+    "buserelin": 0.1,
+}
+
+
+def pareto_mask(efficacy, toxicity) -> np.ndarray:
+    """Маска недоминируемых точек (обе величины минимизируются)"""
+    order = np.lexsort((efficacy, toxicity))
+    mask = np.zeros(efficacy.size, dtype=bool)
+    best = np.inf
+    for i in order:
+        if efficacy[i] < best:
+            mask[i] = True
+            best = efficacy[i]
+    return mask
+
+
+def lattice_drug_effect(reg, combos, base) -> np.ndarray:
+    """Суммарный эффект [B, n_t] для множителей combos [B, n_drugs], накопленный по препаратам"""
+    effect = np.zeros((len(combos), base.shape[1]))
+    for i, name in enumerate(reg.drugs):
+        p = PK_PD_PARAMS[name]
+        effect += E_of_C(combos[:, i, None] * base[i], p["E_max"], p["EC50"])
+    return effect
+
+
+def weighted_exposure(reg, auc, base_auc) -> np.ndarray:
+    """
+    Токсичность [B]: сумма AUC препаратов с весом TOXICITY_WEIGHTS
+
+    AUC каждого препарата делится на AUC трёх недель его стандартного введения,
+    поэтому токсичность накапливается с длительностью схемы: D × 4 весит меньше
+    ежедневного препарата на год.
+
+    Args:
+        auc: [B, n_drugs]; base_auc: [n_drugs] — AUC схемы при множителях 1
+    """
+    n_doses = np.bincount(reg.event_drug, minlength=len(reg.drugs))
+    days_per_dose = np.array([INTERVAL_TO_DAYS.get(info.interval, 21.0) for info in reg.drug_info])
+    cycle_auc = np.divide(base_auc * 21.0, n_doses * days_per_dose,
+                          out=np.zeros_like(base_auc), where=n_doses > 0)
+    scale = np.array([TOXICITY_WEIGHTS[name] for name in reg.drugs])
+    scale = np.divide(scale, cycle_auc, out=np.zeros_like(scale), where=cycle_auc > 0)
+    # округление убирает шум суммы, иначе равные по токсичности комбинации попадают на фронт обе
+    return np.round(auc @ scale, 9)
+
+
+def evaluate_dose_lattice(regimen_name,
+                          subtype,
+                          ki67_percent,
+                          V0,
+                          bsa=DEFAULT_BSA,
+                          dose_scales=None,
+                          mutation_rate=0.01,
+                          resistance_strength=0.5):
+    """
+    Все комбинации множителей пакетами по PARETO_CHUNK_SIZE
+
+    Множители reg.fixed_drugs закреплены на 1, решётка строится только по остальным препаратам.
+    Решётка больше MAX_PARETO_COMBOS — ValueError.
+
+    Returns:
+        combos [B, n_drugs], t [n_out], V [B, n_out], auc [B, n_drugs] (мг·день/л),
+        toxicity [B] — weighted_exposure
+    """
+    if subtype not in params_pop:
+        raise ValueError(f"Неизвестный подтип {subtype}")
+
+    dose_scales = DEFAULT_DOSE_SCALES if dose_scales is None else dose_scales
+    reg = get_regimen(regimen_name)
+    pop = params_pop[subtype]
+
+    t_grid = pk_time_grid(reg.horizon)
+    base = regimen_concentrations(reg, {}, t_grid, bsa=bsa)
+    searched = [i for i, d in enumerate(reg.drugs) if d not in reg.fixed_drugs]
+    n_combos = len(dose_scales) ** len(searched)
+    if n_combos > MAX_PARETO_COMBOS:
+        raise ValueError(
+            f"Решётка доз схемы {regimen_name} слишком велика: {n_combos} комбинаций, "
+            f"допустимо не более {MAX_PARETO_COMBOS}"
+        )
+    lattice = np.array(list(product(dose_scales, repeat=len(searched))), dtype=float)
+    combos = np.ones((len(lattice), len(reg.drugs)))
+    combos[:, searched] = lattice
+
+    # концентрация линейна по дозе, поэтому и AUC
+    base_auc = np.trapezoid(base, t_grid, axis=-1)
+    auc = combos * base_auc
+    toxicity = weighted_exposure(reg, auc, base_auc)
+
+    r = r_from_ki67(ki67_percent / 100.0, T_cycle_dict[subtype])
+    V = []
+    for start in range(0, len(combos), PARETO_CHUNK_SIZE):
+        t, V_chunk, _, _, _ = simulate_patients_batch(
+            r=r,
+            K=pop["K"],
+            d_base=pop["d"],
+            k_clear=pop["k_clear"],
+            f_N0=pop["f_N0"],
+            V0=V0,
+            effect_grid=lattice_drug_effect(reg, combos[start:start + PARETO_CHUNK_SIZE], base),
+            t_end=reg.horizon,
+            mutation_rate=mutation_rate,
+            resistance_strength=resistance_strength,
+        )
+        V.append(V_chunk)
+    return combos, t, np.concatenate(V), auc, toxicity
+
+
+def pareto_front_regimen(regimen_name,
+                         subtype,
+                         ki67_percent,
+                         V0,
+                         bsa=DEFAULT_BSA,
+                         dose_scales=None,
+                         objective="min_final_volume"):
+    """
+    Фронт Парето комбинаций доз по (V(t_end) или min V, токсичность)
+
+    Returns:
+        {"t", "front": [{"dose_multipliers", "efficacy", "toxicity", "auc", "V"}, ...], "n_combos"},
+        точки фронта упорядочены по возрастанию токсичности
+    """
+    reg = get_regimen(regimen_name)
+    combos, t, V, auc, toxicity = evaluate_dose_lattice(
+        regimen_name, subtype, ki67_percent, V0, bsa=bsa, dose_scales=dose_scales,
+    )
+    efficacy = V[:, -1] if objective == "min_final_volume" else V.min(axis=1)
+
+    front = np.flatnonzero(pareto_mask(efficacy, toxicity))
+    front = front[np.argsort(toxicity[front], kind="stable")]
+    return {
+        "t": t,
+        "front": [
+            {
+                "dose_multipliers": dict(zip(reg.drugs, combos[i].tolist())),
+                "efficacy": float(efficacy[i]),
+                "toxicity": float(toxicity[i]),
+                "auc": dict(zip(reg.drugs, auc[i].tolist())),
+                "V": V[i],
+            }
+            for i in front
+        ],
+        "n_combos": len(combos),
+    }
+
+
+def run_pareto_optimization(params: dict) -> dict:
+
+    result = pareto_front_regimen(
+        regimen_name=params["regimen"],
+        subtype=params["subtype"],
+        ki67_percent=params["ki67"],
+        V0=to_volume_from_diameter(params["tumor_size_cm"]),
+        bsa=bucket_bsa(params.get("bsa", DEFAULT_BSA)),
+    )
+    return {
+        "ok": True,
+        "t": result["t"].tolist(),
+        "front": [point | {"V": point["V"].tolist()} for point in result["front"]],
+        "n_combos": result["n_combos"],
+    }
@@ -0,0 +1,96 @@
+"""
+Кэш PK-кривых на процесс.
+
+Концентрация линейна по дозе, поэтому кэшируется кривая для базовых доз
+схемы (множитель 1, без учёта BSA), а масштабирование на множитель и
+площадь поверхности тела делается при чтении. Вытеснение — LRU с
+ограничением по суммарному объёму массивов в байтах. Если подключён общий
+файл кривых (src.math_models.pk_store), кривые стандартных схем берутся из
+него без копирования и в LRU не попадают.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from src.config import config
+
+
+class PKCurveCache:
+    """LRU-кэш массивов концентраций, ограниченный по памяти"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._resident_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.shared = None
+        self.shared_hits = 0
+
+    def attach(self, shared):
+        """Подключает общий файл кривых (PKStore); None — отключить"""
+        self.shared = shared
+
+    def get_or_compute(self, key, compute) -> np.ndarray:
+        """
+        Кривая по ключу; при промахе считается через compute() и кладётся в кэш
+
+        Returns:
+            массив только для чтения — вызывающий код масштабирует его копией
+        """
+        if self.shared is not None:
+            curve = self.shared.get(key)
+            if curve is not None:
+                with self._lock:
+                    self.shared_hits += 1
+                return curve
+
+        with self._lock:
+            curve = self._entries.get(key)
+            if curve is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return curve
+            self.misses += 1
+
+        curve = np.asarray(compute(), dtype=float)
+        curve.setflags(write=False)
+        if curve.nbytes > self.max_bytes:
+            return curve
+
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = curve
+                self._resident_bytes += curve.nbytes
+            while self._resident_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._resident_bytes -= evicted.nbytes
+                self.evictions += 1
+        return curve
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._resident_bytes = 0
+
+    def stats(self) -> dict:
+        # попадания в общий файл — тоже попадания: кривая не пересчитывалась
+        total = self.hits + self.shared_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "resident_bytes": self._resident_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.shared_hits) / total if total else 0.0,
+            "shared_hits": self.shared_hits,
+            "shared_hit_rate": self.shared_hits / total if total else 0.0,
+            "shared": self.shared.stats() if self.shared is not None else None,
+        }
+
+
+pk_cache = PKCurveCache(max_bytes=config.PK_CACHE_MAX_BYTES)
@@ -0,0 +1,168 @@
+"""
+Общий для всех воркеров файл PK-кривых.
+
+Офлайн-инструмент один раз считает единичные кривые (pk_unit_curve) всех схем
+FRONTEND_REGIMENS и их комбинаций с гормонотерапией и пишет их одним массивом
+curves.npy с индексом в meta.json. Воркеры открывают файл через memmap:
+страницы лежат в page cache ОС в одном экземпляре на всю машину, кривые
+отдаются срезами только для чтения без копирования, а собственный LRU pk_cache
+заполняется только кривыми вне файла (нестандартные схемы введения).
+
+Запуск:
+    python -m src.math_models.pk_store --out src/math_models/pk_store
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from loguru import logger
+
+from src.math_models.core import (
+    FRONTEND_REGIMENS,
+    PK_GRID_STEP,
+    PK_PD_PARAMS,
+    SIMULATION_VERSION,
+    pk_curve_key,
+    pk_impulse_response,
+    pk_time_grid,
+    superpose_doses,
+)
+from src.math_models.regimens import (
+    HER2_REGIMEN_NAMES,
+    HORMONE_REGIMEN_NAMES,
+    REGIMENS,
+    combined_regimen_name,
+    get_regimen,
+)
+
+
+def pk_fingerprint() -> str:
+    """Хэш входов PK-кривых: при изменении параметров препаратов или схем файл устаревает"""
+    payload = {
+        "simulation_version": SIMULATION_VERSION,
+        "PK_PD_PARAMS": PK_PD_PARAMS,
+        "FRONTEND_REGIMENS": FRONTEND_REGIMENS,
+        "PK_GRID_STEP": PK_GRID_STEP,
+    }
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def curve_name(key) -> str:
+    """Имя кривой в индексе по ключу pk_curve_key"""
+    return hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+
+
+def _standard_regimens():
+    yield from REGIMENS.values()
+    for primary in HER2_REGIMEN_NAMES:
+        for secondary in HORMONE_REGIMEN_NAMES:
+            yield get_regimen(combined_regimen_name(primary, secondary))
+
+
+def build_pk_store(out_dir) -> dict:
+    """
+    Считает единичные кривые стандартных схем и атомарно записывает их в out_dir
+
+    Returns:
+        метаданные (содержимое meta.json)
+    """
+    out_dir = Path(out_dir)
+    started = time.perf_counter()
+
+    curves, index, offset = [], {}, 0
+    for reg in _standard_regimens():
+        t_grid = pk_time_grid(reg.horizon)
+        for i, pk_name in enumerate(reg.drugs):
+            mask = reg.event_drug == i
+            event_time, event_dose = reg.event_time[mask], reg.event_dose[mask]
+            name = curve_name(pk_curve_key(pk_name, event_time, event_dose, t_grid))
+            if name in index:
+                continue
+            curve = superpose_doses(t_grid, event_time, event_dose, *pk_impulse_response(pk_name))
+            index[name] = [offset, curve.size]
+            curves.append(curve)
+            offset += curve.size
+
+    packed = np.concatenate(curves) if curves else np.zeros(0)
+    meta = {
+        "fingerprint": pk_fingerprint(),
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "build_seconds": round(time.perf_counter() - started, 2),
+        "n_curves": len(index),
+        "bytes": int(packed.nbytes),
+        "index": index,
+    }
+
+    out_dir.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(prefix=".pk_store_", dir=out_dir.parent))
+    np.save(tmp_dir / "curves.npy", packed)
+    with open(tmp_dir / "meta.json", "w", encoding="utf-8") as fh:
+        json.dump(meta, fh, ensure_ascii=False)
+
+    if out_dir.exists():
+        old_dir = out_dir.with_name(out_dir.name + ".old")
+        os.replace(out_dir, old_dir)
+        os.replace(tmp_dir, out_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+    else:
+        os.replace(tmp_dir, out_dir)
+
+    logger.info(f"Файл PK-кривых записан в {out_dir}: {meta['n_curves']} кривых, {meta['bytes']} байт")
+    return meta
+
+
+class PKStore:
+    """Кривые из curves.npy, открытого через memmap"""
+
+    def __init__(self, store_dir):
+        store_dir = Path(store_dir)
+        with open(store_dir / "meta.json", "r", encoding="utf-8") as fh:
+            self.meta = json.load(fh)
+        self.index = self.meta["index"]
+        # asarray снимает подкласс memmap, но оставляет вид на отображённую память
+        self.curves = np.asarray(np.load(store_dir / "curves.npy", mmap_mode="r"))
+
+    @property
+    def fingerprint(self) -> str:
+        return self.meta["fingerprint"]
+
+    def get(self, key) -> np.ndarray | None:
+        """Кривая по ключу pk_curve_key (срез только для чтения) или None"""
+        entry = self.index.get(curve_name(key))
+        if entry is None:
+            return None
+        offset, size = entry
+        return self.curves[offset:offset + size]
+
+    def stats(self) -> dict:
+        return {"curves": self.meta["n_curves"], "mapped_bytes": self.meta["bytes"]}
+
+
+def load_pk_store(store_dir) -> PKStore | None:
+    """Открывает файл кривых, если он есть и посчитан для текущих параметров модели"""
+    if not (Path(store_dir) / "meta.json").exists():
+        logger.info(f"Файл PK-кривых {store_dir} не найден, кривые считаются в каждом процессе")
+        return None
+
+    store = PKStore(store_dir)
+    if store.fingerprint != pk_fingerprint():
+        logger.warning(f"Файл PK-кривых {store_dir} устарел (изменились параметры модели), игнорируется")
+        return None
+
+    logger.info(f"Загружен файл PK-кривых {store_dir} от {store.meta['created_at']}")
+    return store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Предрасчёт общего файла PK-кривых стандартных схем")
+    parser.add_argument("--out", default="src/math_models/pk_store")
+    args = parser.parse_args()
+
+    build_pk_store(out_dir=args.out)
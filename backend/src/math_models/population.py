@@ -0,0 +1,201 @@
+"""
+Режим популяционной вариабельности (виртуальные пациенты).
+
+params_pop и PK_PD_PARAMS задают точечные значения. Здесь из них сэмплируется
+N виртуальных пациентов, все они считаются одним векторным пакетом через
+simulate_patients_batch, а на выходе получаются перцентильные полосы V(t).
+"""
+import numpy as np
+
+from src.math_models.core import (
+    DEFAULT_BSA,
+    T_cycle_dict,
+    params_pop,
+    pk_impulse_response,
+    pk_time_grid,
+    bucket_bsa,
+    r_from_ki67,
+    regimen_drug_effect,
+    simulate_patients_batch,
+    to_volume_from_diameter,
+    _compute_absolute_dose,
+)
+from src.math_models.regimens import get_regimen
+
+# распределения вокруг точечных значений: mean = значение из params_pop / PK_PD_PARAMS,
+# cv — коэффициент вариации; "CL" — множитель клиренса, сэмплируется независимо для каждого препарата
+POPULATION_VARIABILITY = {
+    "d": {"dist": "lognormal", "cv": 0.3},
+    "k_clear": {"dist": "lognormal", "cv": 0.3},
+    "K": {"dist": "lognormal", "cv": 0.2},
+    "f_N0": {"dist": "beta", "cv": 0.25},
+    "CL": {"dist": "lognormal", "cv": 0.25},
+}
+
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def _sample(rng, spec, mean, size):
+    cv = spec.get("cv", 0.0)
+    if cv <= 0:
+        return np.full(size, float(mean))
+
+    dist = spec["dist"]
+    if dist == "lognormal":
+        sigma2 = np.log1p(cv * cv)
+        return rng.lognormal(np.log(mean) - sigma2 / 2.0, np.sqrt(sigma2), size)
+    if dist == "normal":
+        return np.clip(rng.normal(mean, cv * mean, size), 0.0, None)
+    if dist == "beta":
+        var = (cv * mean) ** 2
+        nu = mean * (1.0 - mean) / var - 1.0
+        if nu <= 0:
+            raise ValueError(f"Слишком большой cv={cv} для beta-распределения со средним {mean}")
+        return rng.beta(mean * nu, (1.0 - mean) * nu, size)
+    raise ValueError(f"Неизвестное распределение {dist}")
+
+
+def sample_virtual_patients(subtype, drugs, n_patients, rng, variability=None) -> dict:
+    """
+    Сэмплирует параметры виртуальных пациентов
+
+    Returns:
+        словарь массивов [n_patients] для d, k_clear, K, f_N0 и
+        "CL" — множители клиренса формы [n_patients, len(drugs)]
+    """
+    if subtype not in params_pop:
+        raise ValueError(f"Неизвестный подтип {subtype}")
+
+    variability = POPULATION_VARIABILITY if variability is None else variability
+    pop = params_pop[subtype]
+
+    sampled = {
+        name: _sample(rng, variability.get(name, {}), pop[name], n_patients)
+        for name in ("d", "k_clear", "K", "f_N0")
+    }
+    sampled["CL"] = _sample(rng, variability.get("CL", {}), 1.0, (n_patients, len(drugs)))
+    return sampled
+
+
+def superpose_doses_batch(t_grid, event_time, event_amount, rates, coefs):
+    """
+    superpose_doses для пакета пациентов с общими введениями и своими экспонентами
+
+    Между введениями кривая — чистая экспонента, поэтому достаточно пересчитать
+    состояние в узлах введений (цикл по введениям, вектор по пациентам), а узлы
+    сетки заполнить одним затуханием от ближайшего предыдущего введения.
+
+    Args:
+        rates, coefs: [n_exp, n_patients] (coefs может быть [n_exp])
+
+    Returns:
+        концентрации [n_patients, n_t]
+    """
+    n_patients = rates.shape[1]
+    C = np.zeros((n_patients, t_grid.size))
+    if event_time.size == 0:
+        return C
+
+    dt = t_grid[1] - t_grid[0]
+    idx = np.searchsorted(t_grid, event_time, side="left")
+    keep = idx < t_grid.size
+    idx, lag, amount = idx[keep], t_grid[idx[keep]] - event_time[keep], event_amount[keep]
+    if idx.size == 0:
+        return C
+    nodes, event_node = np.unique(idx, return_inverse=True)
+
+    grid = np.arange(t_grid.size)
+    seg = np.searchsorted(nodes, grid, side="right") - 1
+    after = seg >= 0
+    elapsed = (grid[after] - nodes[seg[after]]) * dt
+
+    coefs = np.broadcast_to(coefs.reshape(coefs.shape[0], -1), rates.shape)
+    for rate, coef in zip(rates, coefs):
+        impulses = np.zeros((nodes.size, n_patients))
+        np.add.at(impulses, event_node, amount[:, None] * np.exp(-np.outer(lag, rate)))
+        decay = np.exp(-np.outer(np.diff(nodes) * dt, rate))
+        state = impulses
+        for k in range(1, nodes.size):
+            state[k] += state[k - 1] * decay[k - 1]
+        C[:, after] += coef[:, None] * (state[seg[after]] * np.exp(-np.outer(elapsed, rate))).T
+    return C
+
+
+def population_drug_effect(reg, dose_multipliers, t_grid, cl_scale, bsa=DEFAULT_BSA):
+    """Эффект препаратов [n_patients, n_t] с индивидуальными клиренсами cl_scale [n_patients, n_drugs]"""
+    n_patients = cl_scale.shape[0]
+    C = np.empty((len(reg.drugs), n_patients, t_grid.size))
+    for i, info in enumerate(reg.drug_info):
+        mask = reg.event_drug == i
+        scale = dose_multipliers.get(info.pk_name, 1.0)
+        amounts = _compute_absolute_dose(reg.event_dose[mask], info.unit, scale, bsa)
+        rates, coefs = pk_impulse_response(info.pk_name, cl_scale=cl_scale[:, i])
+        C[i] = superpose_doses_batch(t_grid, reg.event_time[mask], amounts, rates, coefs)
+    return regimen_drug_effect(reg, C)
+
+
+def simulate_population(regimen_name,
+                        subtype,
+                        ki67_percent,
+                        V0,
+                        dose_multipliers=None,
+                        n_patients=200,
+                        seed=None,
+                        percentiles=DEFAULT_PERCENTILES,
+                        variability=None,
+                        bsa=DEFAULT_BSA,
+                        mutation_rate=0.01,
+                        resistance_strength=0.5):
+    """
+    Монте-Карло по виртуальным пациентам для одной схемы и набора множителей доз
+
+    Returns:
+        {"t", "bands": {"p5": V_5(t), ...}, "n_patients"}
+    """
+    dose_multipliers = dose_multipliers or {}
+    reg = get_regimen(regimen_name)
+    rng = np.random.default_rng(seed)
+
+    sampled = sample_virtual_patients(subtype, reg.drugs, n_patients, rng, variability)
+    t_grid = pk_time_grid(reg.horizon)
+    effect = population_drug_effect(reg, dose_multipliers, t_grid, sampled["CL"], bsa=bsa)
+
+    t, V, Ns, Nr, N = simulate_patients_batch(
+        r=r_from_ki67(ki67_percent / 100.0, T_cycle_dict[subtype]),
+        K=sampled["K"],
+        d_base=sampled["d"],
+        k_clear=sampled["k_clear"],
+        f_N0=sampled["f_N0"],
+        V0=V0,
+        effect_grid=effect,
+        t_end=reg.horizon,
+        mutation_rate=mutation_rate,
+        resistance_strength=resistance_strength,
+    )
+
+    bands = np.percentile(V, percentiles, axis=0)
+    return {
+        "t": t,
+        "bands": {f"p{p:g}": band for p, band in zip(percentiles, bands)},
+        "n_patients": n_patients,
+    }
+
+
+def run_population_simulation(params: dict, dose_multipliers=None, n_patients=200, seed=None) -> dict:
+
+    result = simulate_population(
+        regimen_name=params["regimen"],
+        subtype=params["subtype"],
+        ki67_percent=params["ki67"],
+        V0=to_volume_from_diameter(params["tumor_size_cm"]),
+        dose_multipliers=dose_multipliers,
+        n_patients=n_patients,
+        seed=seed,
+        bsa=bucket_bsa(params.get("bsa", DEFAULT_BSA)),
+    )
+    return {
+        "ok": True,
+        "t": result["t"].tolist(),
+        "bands": {name: band.tolist() for name, band in result["bands"].items()},
+        "n_patients": result["n_patients"],
+    }
@@ -0,0 +1,648 @@
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from typing import Literal
+
+import numpy as np
+
+
+FRONTEND_REGIMENS = {
+    "Летрозол": {
+        "type": "simple",
+        "group": "hormone",
+        "drugs": [
+            {
+                "pk_name": "letrozole",
+                "dose": 2.5,
+                "unit": "mg",
+                "interval": "daily",
+                "n_cycles": 365,  
+            }
+        ],
+    },
+    "Анастрозол": {
+        "type": "simple",
+        "group": "hormone",
+        "drugs": [
+            {
+                "pk_name": "anastrozole",
+                "dose": 1.0,
+                "unit": "mg",
+                "interval": "daily",
+                "n_cycles": 365,
+            }
+        ],
+    },
+    "Фулвестрант": {
+        "type": "simple",
+        "group": "hormone",
+        "drugs": [
+            {
+                "pk_name": "fulvestrant",
+                "dose": 500.0,
+                "unit": "mg",
+                "interval": "q4w",
+                "n_cycles": 12,   # 1 год
+            }
+        ],
+    },
+    "Бусерелин": {
+        "type": "simple",
+        "group": "hormone",
+        "drugs": [
+            {
+                "pk_name": "buserelin",
+                "dose": 3.75,
+                "unit": "mg",
+                "interval": "q4w",
+                "n_cycles": 12,
+            }
+        ],
+    },
+    "Торемифен": {
+        "type": "simple",
+        "group": "hormone",
+        "drugs": [
+            {
+                "pk_name": "toremifene",
+                "dose": 60.0,
+                "unit": "mg",
+                "interval": "daily",
+                "n_cycles": 365,
+            }
+        ],
+    },
+    "Тамоксифен → ингибиторы ароматазы": {
+        "type": "phased",
+        "group": "hormone",
+        "phases": [
+            {
+                "duration_days": 3 * 365,
+                "drugs": [
+                    {
+                        "pk_name": "tamoxifen",
+                        "dose": 20.0,
+                        "unit": "mg",
+                        "interval": "daily",
+                    }
+                ],
+            },
+            {
+                "duration_days": 2 * 365,
+                "drugs": [
+                    {
+                        "pk_name": "letrozole", 
+                        "dose": 2.5,
+                        "unit": "mg",
+                        "interval": "daily",
+                    }
+                ],
+            },
+        ],
+    },
+
+    "(DC + трастузумаб) × 4–6": {
+        "type": "phased",
+        "group": "her2",
+        "phases": [
+            {
+                "duration_days": 6 * 21,
+                "drugs": [
+                    {"pk_name": "docetaxel", "dose": 75, "unit": "mg/m2", "interval": "q3w"},
+                    {"pk_name": "cyclophosphamide", "dose": 600, "unit": "mg/m2", "interval": "q3w"},
+                    {"pk_name": "trastuzumab_sc", "dose": 600, "unit": "mg", "interval": "q3w"},
+                ],
+            }
+        ],
+    },
+    "DCН × 6": {
+        "type": "phased",
+        "group": "her2",
+        "phases": [
+            {
+                "duration_days": 6 * 21,
+                "drugs": [
+                    {"pk_name": "docetaxel", "dose": 75, "unit": "mg/m2", "interval": "q3w"},
+                    {"pk_name": "carboplatin", "dose": 600, "unit": "mg/m2", "interval": "q3w"},
+                    {"pk_name": "trastuzumab_sc", "dose": 600, "unit": "mg", "interval": "q3w"},
+                ],
+            }
+        ],
+    },
+    "DCН + пертузумаб × 6": {
+        "type": "phased",
+        "group": "her2",
+        "phases": [
+            {
+                "duration_days": 6 * 21,
+                "drugs": [
+                    {"pk_name": "docetaxel", "dose": 75, "unit": "mg/m2", "interval": "q3w"},
+                    {"pk_name": "carboplatin", "dose": 600, "unit": "mg/m2", "interval": "q3w"},
+                    {"pk_name": "trastuzumab_sc", "dose": 600, "unit": "mg", "interval": "q3w"},
+                    {"pk_name": "pertuzumab", "dose": 420, "unit": "mg", "interval": "q3w"},
+                ],
+            }
+        ],
+    },
+    "(Р + трастузумаб) × 12": {
+        "type": "phased",
+        "group": "her2",
+        "phases": [
+            {
+                "duration_days": 12 * 7,
+                "drugs": [
+                    {"pk_name": "paclitaxel", "dose": 80, "unit": "mg/m2", "interval": "weekly"},
+                    {"pk_name": "trastuzumab_sc", "dose": 600, "unit": "mg", "interval": "weekly"},
+                ],
+            }
+        ],
+    },
+    "AC × 4 → (D + трастузумаб) × 4": {
+        "type": "phased",
+        "group": "her2",
+        "phases": [
+            {
+                "duration_days": 4 * 21,
+                "drugs": [
+                    {"pk_name": "doxorubicin", "dose": 60, "unit": "mg/m2", "interval": "q3w"},
+                    {"pk_name": "cyclophosphamide", "dose": 600, "unit": "mg/m2", "interval": "q3w"},
+                ],
+            },
+            {
+                "duration_days": 4 * 21,
+                "drugs": [
+                    {"pk_name": "docetaxel", "dose": 75, "unit": "mg/m2", "interval": "q3w"},
+                    {"pk_name": "trastuzumab_sc", "dose": 600, "unit": "mg", "interval": "q3w"},
+                ],
+            },
+        ],
+    },
+    "AC × 4 → (Р + трастузумаб) × 12": {
+        "type": "phased",
+        "group": "her2",
+        "phases": [
+            {
+                "duration_days": 4 * 21,
+                "drugs": [
+                    {"pk_name": "doxorubicin", "dose": 60, "unit": "mg/m2", "interval": "q3w"},
+                    {"pk_name": "cyclophosphamide", "dose": 600, "unit": "mg/m2", "interval": "q3w"},
+                ],
+            },
+            {
+                "duration_days": 12 * 7,
+                "drugs": [
+                    {"pk_name": "paclitaxel", "dose": 80, "unit": "mg/m2", "interval": "weekly"},
+                    {"pk_name": "trastuzumab_sc", "dose": 600, "unit": "mg", "interval": "weekly"},
+                ],
+            },
+        ],
+    },
+    "ddAC × 4 → (Р + трастузумаб) × 12": {
+        "type": "phased",
+        "group": "her2",
+        "phases": [
+            {
+                "duration_days": 4 * 14,
+                "drugs": [
+                    {"pk_name": "doxorubicin", "dose": 60, "unit": "mg/m2", "interval": "q2w"},
+                    {"pk_name": "cyclophosphamide", "dose": 600, "unit": "mg/m2", "interval": "q2w"},
+                ],
+            },
+            {
+                "duration_days": 12 * 7,
+                "drugs": [
+                    {"pk_name": "paclitaxel", "dose": 80, "unit": "mg/m2", "interval": "weekly"},
+                    {"pk_name": "trastuzumab_sc", "dose": 600, "unit": "mg", "interval": "weekly"},
+                ],
+            },
+        ],
+    },
+    "ddАС × 4 → (Р + трастузумаб) × 4": {
+        "type": "phased",
+        "group": "her2",
+        "phases": [
+            {
+                "duration_days": 4 * 14,
+                "drugs": [
+                    {"pk_name": "doxorubicin", "dose": 60, "unit": "mg/m2", "interval": "q2w"},
+                    {"pk_name": "cyclophosphamide", "dose": 600, "unit": "mg/m2", "interval": "q2w"},
+                ],
+            },
+            {
+                "duration_days": 4 * 14,
+                "drugs": [
+                    {"pk_name": "paclitaxel", "dose": 175, "unit": "mg/m2", "interval": "q2w"},
+                    {"pk_name": "trastuzumab_sc", "dose": 600, "unit": "mg", "interval": "q2w"},
+                ],
+            },
+        ],
+    },
+    "АС × 4 → (таксаны+ трастузумаб + пертузумаб) × 4": {
+        "type": "phased",
+        "group": "her2",
+        "phases": [
+            {
+                "duration_days": 4 * 21,
+                "drugs": [
+                    {"pk_name": "doxorubicin", "dose": 60, "unit": "mg/m2", "interval": "q3w"},
+                    {"pk_name": "cyclophosphamide", "dose": 600, "unit": "mg/m2", "interval": "q3w"},
+                ],
+            },
+            {
+                "duration_days": 4 * 21,
+                "drugs": [
+                    {"pk_name": "docetaxel", "dose": 75, "unit": "mg/m2", "interval": "q3w"},
+                    {"pk_name": "trastuzumab_sc", "dose": 600, "unit": "mg", "interval": "q3w"},
+                    {"pk_name": "pertuzumab", "dose": 420, "unit": "mg", "interval": "q3w"},
+                ],
+            },
+        ],
+    },
+    "Трастузумаб эмтанзин × 14": {
+        "type": "simple",
+        "group": "her2",
+        "drugs": [
+            {
+                "pk_name": "trastuzumab_emtansine",
+                "dose": 3.6,
+                "unit": "mg/m2",
+                "interval": "q3w",
+                "n_cycles": 14,
+            }
+        ],
+    },
+
+
+    "ddАС × 4 → ddP × 4 АС": {
+        "type": "phased",
+        "group": "her2",
+        "phases": [
+            {
+                "duration_days": 4 * 14,
+                "drugs": [
+                    {"pk_name": "doxorubicin", "dose": 60, "unit": "mg/m2", "interval": "q2w"},
+                    {"pk_name": "cyclophosphamide", "dose": 600, "unit": "mg/m2", "interval": "q2w"},
+                ],
+            },
+            {
+                "duration_days": 4 * 14,
+                "drugs": [
+                    {"pk_name": "paclitaxel", "dose": 175, "unit": "mg/m2", "interval": "q2w"},
+                ],
+            },
+        ],
+    },
+    "ddАC × 4 → P × 12 АС": {
+        "type": "phased",
+        "group": "her2",
+        "phases": [
+            {
+                "duration_days": 4 * 14,
+                "drugs": [
+                    {"pk_name": "doxorubicin", "dose": 60, "unit": "mg/m2", "interval": "q2w"},
+                    {"pk_name": "cyclophosphamide", "dose": 600, "unit": "mg/m2", "interval": "q2w"},
+                ],
+            },
+            {
+                "duration_days": 12 * 7,
+                "drugs": [
+                    {"pk_name": "paclitaxel", "dose": 80, "unit": "mg/m2", "interval": "weekly"},
+                ],
+            },
+        ],
+    },
+    "ddАC × 4 → P + С × 12 АС": {
+        "type": "phased",
+        "group": "her2",
+        "phases": [
+            {
+                "duration_days": 4 * 14,
+                "drugs": [
+                    {"pk_name": "doxorubicin", "dose": 60, "unit": "mg/m2", "interval": "q2w"},
+                    {"pk_name": "cyclophosphamide", "dose": 600, "unit": "mg/m2", "interval": "q2w"},
+                ],
+            },
+            {
+                "duration_days": 12 * 7,
+                "drugs": [
+                    {"pk_name": "paclitaxel", "dose": 80, "unit": "mg/m2", "interval": "weekly"},
+                    {"pk_name": "carboplatin", "dose": 300, "unit": "mg/m2", "interval": "weekly"},
+                ],
+            },
+        ],
+    },
+    "DC × 4–6": {
+        "type": "simple",
+        "group": "her2",
+        "drugs": [
+            {
+                "pk_name": "docetaxel",
+                "dose": 75,
+                "unit": "mg/m2",
+                "interval": "q3w",
+                "n_cycles": 6,
+            },
+            {
+                "pk_name": "cyclophosphamide",
+                "dose": 600,
+                "unit": "mg/m2",
+                "interval": "q3w",
+                "n_cycles": 6,
+            },
+        ],
+    },
+    "AC × 4": {
+        "type": "simple",
+        "group": "her2",
+        "drugs": [
+            {
+                "pk_name": "doxorubicin",
+                "dose": 60,
+                "unit": "mg/m2",
+                "interval": "q3w",
+                "n_cycles": 4,
+            },
+            {
+                "pk_name": "cyclophosphamide",
+                "dose": 600,
+                "unit": "mg/m2",
+                "interval": "q3w",
+                "n_cycles": 4,
+            },
+        ],
+    },
+    "AC × 4 → D × 4": {
+        "type": "phased",
+        "group": "her2",
+        "phases": [
+            {
+                "duration_days": 4 * 21,
+                "drugs": [
+                    {"pk_name": "doxorubicin", "dose": 60, "unit": "mg/m2", "interval": "q3w"},
+                    {"pk_name": "cyclophosphamide", "dose": 600, "unit": "mg/m2", "interval": "q3w"},
+                ],
+            },
+            {
+                "duration_days": 4 * 21,
+                "drugs": [
+                    {"pk_name": "docetaxel", "dose": 75, "unit": "mg/m2", "interval": "q3w"},
+                ],
+            },
+        ],
+    },
+    "AC × 4 → P × 12": {
+        "type": "phased",
+        "group": "her2",
+        "phases": [
+            {
+                "duration_days": 4 * 21,
+                "drugs": [
+                    {"pk_name": "doxorubicin", "dose": 60, "unit": "mg/m2", "interval": "q3w"},
+                    {"pk_name": "cyclophosphamide", "dose": 600, "unit": "mg/m2", "interval": "q3w"},
+                ],
+            },
+            {
+                "duration_days": 12 * 7,
+                "drugs": [
+                    {"pk_name": "paclitaxel", "dose": 80, "unit": "mg/m2", "interval": "weekly"},
+                ],
+            },
+        ],
+    },
+    "Капецитабин (монотерапия)": {
+        "type": "simple",
+        "group": "her2",
+        "drugs": [
+            {
+                "pk_name": "capecitabine",
+                "dose": 2000,
+                "unit": "mg/m2",
+                "interval": "q3w",  
+                "n_cycles": 8,
+            }
+        ],
+    },
+    "Олапариб": {
+        "type": "simple",
+        "group": "her2",
+        "drugs": [
+            {
+                "pk_name": "olaparib",
+                "dose": 600,
+                "unit": "mg",
+                "interval": "daily",
+                "n_cycles": 365,
+            }
+        ],
+    },
+}
+
+
+INTERVAL_TO_DAYS = {
+    "q3w": 21.0,
+    "q2w": 14.0,
+    "weekly": 7.0,
+    "daily": 1.0,
+    "q4w": 28.0,
+    "q6m": 180.0,
+}
+
+
+RegimenGroup = Literal["hormone", "her2", "combined"]
+
+# разделитель имён в комбинированной схеме: "<химио/анти-HER2> | <гормонотерапия>"
+COMBINED_SEPARATOR = " | "
+
+
+@dataclass(frozen=True)
+class RegimenDrug:
+    """Метаданные препарата в схеме (по первому вхождению)"""
+    pk_name: str
+    dose: float
+    unit: str
+    interval: str
+
+
+@dataclass(frozen=True)
+class DoseSegment:
+    """Препарат, вводимый с интервалом interval на отрезке [start, start + duration)"""
+    drug_index: int
+    pk_name: str
+    start: float
+    duration: float
+    dose: float
+    unit: str
+    interval: str
+
+
+@dataclass(frozen=True)
+class CompiledRegimen:
+    """
+    Схема из FRONTEND_REGIMENS, разобранная один раз при импорте
+
+    Attributes:
+        drugs: уникальные pk_name в порядке первого появления
+        drug_info: метаданные препаратов, по индексу совпадают с drugs
+        segments: плоский список отрезков введения по всем фазам
+        horizon: длительность схемы, дни
+        event_time, event_drug, event_dose: введения (день, индекс препарата, номинальная доза)
+        fixed_drugs: препараты с фиксированной стандартной дозой — в подборе доз не участвуют
+    """
+    name: str
+    group: RegimenGroup
+    horizon: float
+    drugs: tuple[str, ...]
+    drug_info: tuple[RegimenDrug, ...]
+    segments: tuple[DoseSegment, ...]
+    event_time: np.ndarray
+    event_drug: np.ndarray
+    event_dose: np.ndarray
+    fixed_drugs: tuple[str, ...] = ()
+
+    def drug_index(self, pk_name: str) -> int:
+        return self.drugs.index(pk_name)
+
+
+def _readonly(arr):
+    arr.setflags(write=False)
+    return arr
+
+
+def compile_regimen(name, reg) -> CompiledRegimen:
+    if reg["type"] == "simple":
+        phases = [(0.0, None, reg["drugs"])]
+    elif reg["type"] == "phased":
+        phases = []
+        t_shift = 0.0
+        for phase in reg["phases"]:
+            duration = float(phase["duration_days"])
+            phases.append((t_shift, duration, phase["drugs"]))
+            t_shift += duration
+    else:
+        raise ValueError(f"Неизвестный тип схемы {reg['type']}")
+
+    drugs = []
+    drug_info = []
+    segments = []
+    for start, duration, phase_drugs in phases:
+        for d in phase_drugs:
+            pk_name = d["pk_name"]
+            if pk_name not in drugs:
+                drugs.append(pk_name)
+                drug_info.append(RegimenDrug(pk_name, d["dose"], d["unit"], d["interval"]))
+            if duration is None:
+                seg_duration = d.get("n_cycles", 1) * INTERVAL_TO_DAYS.get(d["interval"], 21.0)
+            else:
+                seg_duration = duration
+            segments.append(DoseSegment(
+                drug_index=drugs.index(pk_name),
+                pk_name=pk_name,
+                start=start,
+                duration=seg_duration,
+                dose=d["dose"],
+                unit=d["unit"],
+                interval=d["interval"],
+            ))
+
+    if reg["type"] == "simple":
+        horizon = max((s.duration for s in segments), default=0.0)
+    else:
+        horizon = sum(duration for _, duration, _ in phases)
+    if horizon <= 0:
+        horizon = 365.0
+
+    times, drug_idx, doses = [], [], []
+    for seg in segments:
+        step = INTERVAL_TO_DAYS.get(seg.interval, 21.0)
+        seg_times = seg.start + np.arange(0.0, seg.duration, step)
+        times.append(seg_times)
+        drug_idx.append(np.full(seg_times.size, seg.drug_index, dtype=np.int64))
+        doses.append(np.full(seg_times.size, float(seg.dose)))
+
+    order = np.argsort(np.concatenate(times), kind="stable")
+
+    return CompiledRegimen(
+        name=name,
+        group=reg["group"],
+        horizon=float(horizon),
+        drugs=tuple(drugs),
+        drug_info=tuple(drug_info),
+        segments=tuple(segments),
+        event_time=_readonly(np.concatenate(times)[order]),
+        event_drug=_readonly(np.concatenate(drug_idx)[order]),
+        event_dose=_readonly(np.concatenate(doses)[order]),
+    )
+
+
+REGIMENS: dict[str, CompiledRegimen] = {
+    name: compile_regimen(name, reg) for name, reg in FRONTEND_REGIMENS.items()
+}
+
+HORMONE_REGIMEN_NAMES = tuple(name for name, reg in REGIMENS.items() if reg.group == "hormone")
+HER2_REGIMEN_NAMES = tuple(name for name, reg in REGIMENS.items() if reg.group == "her2")
+
+
+def combine_regimens(primary: CompiledRegimen, secondary: CompiledRegimen) -> CompiledRegimen:
+    """
+    Объединяет две схемы на общем горизонте (обе стартуют в день 0)
+
+    Препараты secondary (гормонотерапия) дозируются стандартно и попадают в
+    fixed_drugs, так что перебор доз идёт только по препаратам primary.
+
+    Args:
+        primary: химио/анти-HER2 схема
+        secondary: схема гормонотерапии
+
+    Returns:
+        CompiledRegimen группы "combined"
+    """
+    shared = set(primary.drugs) & set(secondary.drugs)
+    if shared:
+        raise ValueError(f"Схемы {primary.name} и {secondary.name} содержат общие препараты: {sorted(shared)}")
+
+    offset = len(primary.drugs)
+    event_time = np.concatenate([primary.event_time, secondary.event_time])
+    event_drug = np.concatenate([primary.event_drug, secondary.event_drug + offset])
+    event_dose = np.concatenate([primary.event_dose, secondary.event_dose])
+    order = np.argsort(event_time, kind="stable")
+
+    return CompiledRegimen(
+        name=combined_regimen_name(primary.name, secondary.name),
+        group="combined",
+        horizon=max(primary.horizon, secondary.horizon),
+        drugs=primary.drugs + secondary.drugs,
+        drug_info=primary.drug_info + secondary.drug_info,
+        segments=primary.segments + tuple(
+            replace(seg, drug_index=seg.drug_index + offset) for seg in secondary.segments
+        ),
+        event_time=_readonly(event_time[order]),
+        event_drug=_readonly(event_drug[order]),
+        event_dose=_readonly(event_dose[order]),
+        fixed_drugs=primary.fixed_drugs + secondary.drugs,
+    )
+
+
+def combined_regimen_name(primary_name, secondary_name) -> str:
+    return f"{primary_name}{COMBINED_SEPARATOR}{secondary_name}"
+
+
+def patient_regimen_names() -> tuple[str, ...]:
+    """Все схемы, которые симулируются по данным пациентки: химио/анти-HER2 и их комбинации с гормонотерапией"""
+    return HER2_REGIMEN_NAMES + tuple(
+        combined_regimen_name(primary, secondary)
+        for primary in HER2_REGIMEN_NAMES
+        for secondary in HORMONE_REGIMEN_NAMES
+    )
+
+
+@lru_cache(maxsize=None)
+def _combined_regimen(regimen_name) -> CompiledRegimen:
+    primary_name, secondary_name = regimen_name.split(COMBINED_SEPARATOR, 1)
+    return combine_regimens(get_regimen(primary_name), get_regimen(secondary_name))
+
+
+def get_regimen(regimen_name) -> CompiledRegimen:
+    if regimen_name in REGIMENS:
+        return REGIMENS[regimen_name]
+    if COMBINED_SEPARATOR in regimen_name:
+        return _combined_regimen(regimen_name)
+    raise ValueError(f"Схема {regimen_name} не найдена во FRONTEND_REGIMENS")
@@ -0,0 +1,281 @@
+"""
+Предрасчитанные таблицы ответа на схемы лечения.
+
+Офлайн-инструмент перебирает сетку (подтип, схема, Ki-67, размер опухоли)
+по всем схемам, которые запрашивает simulation_params (химио/анти-HER2 и их
+комбинации с гормонотерапией), для каждого узла запускает оптимизатор доз в
+том режиме, в котором схему считает API (перебор по сетке, для комбинированных
+— COMBINED_DOSE_SEARCH), и сохраняет оптимальные множители доз и траектории в
+компактную индексированную таблицу на диске. Режим записан в таблице, и
+запрос с другим режимом из неё не отвечается.
+API отдаёт результат из таблицы по ближайшему узлу сетки, а живая симуляция
+запускается только для запросов вне сетки. Таблица считается для DEFAULT_BSA
+и используется только для пациентов из той же корзины BSA.
+
+Запуск:
+    python -m src.math_models.response_table --out src/math_models/response_table
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from loguru import logger
+
+from src.config import config
+from src.math_models.core import (
+    DEFAULT_BSA,
+    DEFAULT_DOSE_SCALES,
+    FRONTEND_REGIMENS,
+    PK_PD_PARAMS,
+    SIMULATION_VERSION,
+    T_cycle_dict,
+    bucket_bsa,
+    format_simulation_result,
+    optimize_frontend_regimen,
+    optimize_frontend_regimen_continuous,
+    params_pop,
+    to_volume_from_diameter,
+)
+from src.math_models.regimens import COMBINED_SEPARATOR, get_regimen, patient_regimen_names
+
+TRAJECTORY_FIELDS = ("V", "Ns", "Nr", "N")
+N_TIME_POINTS = 50
+
+DEFAULT_KI67_GRID = tuple(float(k) for k in range(0, 101, 10))
+DEFAULT_TUMOR_SIZE_GRID = tuple(float(s) for s in range(1, 16))
+
+
+def model_fingerprint() -> str:
+    """Хэш всех входов модели: при изменении PK_PD_PARAMS, params_pop и т.п. таблица устаревает"""
+    payload = {
+        "simulation_version": SIMULATION_VERSION,
+        "PK_PD_PARAMS": PK_PD_PARAMS,
+        "params_pop": params_pop,
+        "T_cycle_dict": T_cycle_dict,
+        "FRONTEND_REGIMENS": FRONTEND_REGIMENS,
+        "DEFAULT_DOSE_SCALES": DEFAULT_DOSE_SCALES,
+    }
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def table_dose_search(regimen_name) -> str:
+    """Режим подбора доз схемы, как в simulation_params"""
+    return config.COMBINED_DOSE_SEARCH if COMBINED_SEPARATOR in regimen_name else "grid"
+
+
+def _sweep_regimen(subtype, regimen_name, dose_search, ki67_grid, size_grid):
+    """Считает все узлы (Ki-67 × размер) для одной пары подтип/схема"""
+    drugs = get_regimen(regimen_name).drugs
+    optimizer = optimize_frontend_regimen_continuous if dose_search == "continuous" else optimize_frontend_regimen
+    shape = (len(ki67_grid), len(size_grid))
+    multipliers = np.full(shape + (len(drugs),), np.nan)
+    trajectories = {f: np.full(shape + (N_TIME_POINTS,), np.nan, dtype=np.float32) for f in TRAJECTORY_FIELDS}
+    t = None
+
+    for i, ki67 in enumerate(ki67_grid):
+        for j, size in enumerate(size_grid):
+            best = optimizer(
+                regimen_name=regimen_name,
+                subtype=subtype,
+                ki67_percent=ki67,
+                V0=to_volume_from_diameter(size),
+                bsa=DEFAULT_BSA,
+            )
+            if best is None:
+                continue
+            t = best["t"]
+            multipliers[i, j] = [best["dose_multipliers"][d] for d in drugs]
+            for f in TRAJECTORY_FIELDS:
+                trajectories[f][i, j] = best[f]
+
+    return subtype, regimen_name, t, multipliers, trajectories
+
+
+def build_response_table(out_dir,
+                         ki67_grid=DEFAULT_KI67_GRID,
+                         size_grid=DEFAULT_TUMOR_SIZE_GRID,
+                         workers=None):
+    """
+    Перебирает сетку и атомарно записывает таблицу в out_dir
+
+    Args:
+        out_dir: директория таблицы (перезаписывается целиком)
+        ki67_grid: узлы сетки по Ki-67, %
+        size_grid: узлы сетки по размеру опухоли, см
+        workers: число процессов (None — по числу ядер)
+    """
+    out_dir = Path(out_dir)
+    subtypes = list(params_pop)
+    regimens = list(patient_regimen_names())
+    drugs = {name: list(get_regimen(name).drugs) for name in regimens}
+    dose_search = {name: table_dose_search(name) for name in regimens}
+    max_drugs = max(len(v) for v in drugs.values())
+
+    shape = (len(subtypes), len(regimens), len(ki67_grid), len(size_grid))
+    multipliers = np.full(shape + (max_drugs,), np.nan)
+    trajectories = {f: np.full(shape + (N_TIME_POINTS,), np.nan, dtype=np.float32) for f in TRAJECTORY_FIELDS}
+    t_table = np.full((len(regimens), N_TIME_POINTS), np.nan, dtype=np.float32)
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_sweep_regimen, subtype, regimen, dose_search[regimen], ki67_grid, size_grid)
+            for subtype in subtypes
+            for regimen in regimens
+        ]
+        for fut in futures:
+            subtype, regimen, t, mult, traj = fut.result()
+            s, r = subtypes.index(subtype), regimens.index(regimen)
+            multipliers[s, r, ..., :mult.shape[-1]] = mult
+            for f in TRAJECTORY_FIELDS:
+                trajectories[f][s, r] = traj[f]
+            if t is not None:
+                t_table[r] = t
+            logger.info(f"Таблица: {subtype} / {regimen} готова")
+
+    meta = {
+        "fingerprint": model_fingerprint(),
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "build_seconds": round(time.perf_counter() - started, 2),
+        "subtypes": subtypes,
+        "regimens": regimens,
+        "drugs": drugs,
+        "dose_search": dose_search,
+        "bsa": DEFAULT_BSA,
+        "ki67_grid": list(ki67_grid),
+        "size_grid": list(size_grid),
+    }
+
+    out_dir.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(prefix=".response_table_", dir=out_dir.parent))
+    np.save(tmp_dir / "t.npy", t_table)
+    np.save(tmp_dir / "multipliers.npy", multipliers)
+    for f in TRAJECTORY_FIELDS:
+        np.save(tmp_dir / f"{f}.npy", trajectories[f])
+    with open(tmp_dir / "meta.json", "w", encoding="utf-8") as fh:
+        json.dump(meta, fh, ensure_ascii=False, indent=2)
+
+    if out_dir.exists():
+        old_dir = out_dir.with_name(out_dir.name + ".old")
+        os.replace(out_dir, old_dir)
+        os.replace(tmp_dir, out_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+    else:
+        os.replace(tmp_dir, out_dir)
+
+    logger.info(f"Таблица ответов записана в {out_dir} за {meta['build_seconds']} с")
+    return meta
+
+
+class ResponseTable:
+    """Таблица предрасчитанных ответов, открытая через memmap"""
+
+    def __init__(self, table_dir, ki67_tolerance=0.0, size_tolerance=0.0):
+        table_dir = Path(table_dir)
+        with open(table_dir / "meta.json", "r", encoding="utf-8") as fh:
+            self.meta = json.load(fh)
+
+        self.ki67_tolerance = ki67_tolerance
+        self.size_tolerance = size_tolerance
+        self.subtype_index = {s: i for i, s in enumerate(self.meta["subtypes"])}
+        self.regimen_index = {r: i for i, r in enumerate(self.meta["regimens"])}
+        self.ki67_grid = np.asarray(self.meta["ki67_grid"], dtype=float)
+        self.size_grid = np.asarray(self.meta["size_grid"], dtype=float)
+
+        self.t = np.load(table_dir / "t.npy", mmap_mode="r")
+        self.multipliers = np.load(table_dir / "multipliers.npy", mmap_mode="r")
+        self.trajectories = {f: np.load(table_dir / f"{f}.npy", mmap_mode="r") for f in TRAJECTORY_FIELDS}
+
+    @property
+    def fingerprint(self) -> str:
+        return self.meta["fingerprint"]
+
+    @staticmethod
+    def _nearest(grid, value, tolerance):
+        i = int(np.abs(grid - value).argmin())
+        return i if abs(grid[i] - value) <= tolerance else None
+
+    def lookup(self, subtype, regimen, ki67, tumor_size_cm, bsa=DEFAULT_BSA, dose_search="grid") -> dict | None:
+        """
+        Ищет ближайший узел сетки
+
+        Returns:
+            Результат в формате run_simulation или None, если запрос вне сетки
+            или схема в таблице посчитана в другом режиме подбора доз
+        """
+        if bucket_bsa(bsa) != bucket_bsa(self.meta["bsa"]):
+            return None
+        if self.meta.get("dose_search", {}).get(regimen, "grid") != dose_search:
+            return None
+
+        s = self.subtype_index.get(subtype)
+        r = self.regimen_index.get(regimen)
+        if s is None or r is None:
+            return None
+
+        i = self._nearest(self.ki67_grid, ki67, self.ki67_tolerance)
+        j = self._nearest(self.size_grid, tumor_size_cm, self.size_tolerance)
+        if i is None or j is None:
+            return None
+
+        drugs = self.meta["drugs"][regimen]
+        mult = self.multipliers[s, r, i, j, :len(drugs)]
+        if np.isnan(mult).any():
+            return None
+
+        best = {
+            "dose_multipliers": {d: float(m) for d, m in zip(drugs, mult)},
+            "t": self.t[r],
+        }
+        for f in TRAJECTORY_FIELDS:
+            best[f] = self.trajectories[f][s, r, i, j]
+        return format_simulation_result(regimen, best)
+
+
+def load_response_table(table_dir, ki67_tolerance=0.0, size_tolerance=0.0) -> ResponseTable | None:
+    """Открывает таблицу, если она есть и посчитана для текущих параметров модели"""
+    if not (Path(table_dir) / "meta.json").exists():
+        logger.info(f"Таблица ответов {table_dir} не найдена, используется живая симуляция")
+        return None
+
+    table = ResponseTable(table_dir, ki67_tolerance=ki67_tolerance, size_tolerance=size_tolerance)
+    if table.fingerprint != model_fingerprint():
+        logger.warning(f"Таблица ответов {table_dir} устарела (изменились параметры модели), игнорируется")
+        return None
+
+    logger.info(f"Загружена таблица ответов {table_dir} от {table.meta['created_at']}")
+    return table
+
+
+def _parse_grid(raw: str) -> tuple[float, ...]:
+    """'1-15' -> 1..15 с шагом 1, '0-100:10' -> 0..100 с шагом 10, '1,2,5' -> список"""
+    if "-" in raw and "," not in raw:
+        bounds, _, step = raw.partition(":")
+        lo, hi = (float(x) for x in bounds.split("-"))
+        step = float(step) if step else 1.0
+        return tuple(float(x) for x in np.arange(lo, hi + step / 2, step))
+    return tuple(float(x) for x in raw.split(","))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Предрасчёт таблицы ответов на схемы лечения")
+    parser.add_argument("--out", default="src/math_models/response_table")
+    parser.add_argument("--ki67", default="0-100:10", help="сетка Ki-67, например 0-100:10")
+    parser.add_argument("--sizes", default="1-15", help="сетка размеров опухоли, см, например 1-15")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    build_response_table(
+        out_dir=args.out,
+        ki67_grid=_parse_grid(args.ki67),
+        size_grid=_parse_grid(args.sizes),
+        workers=args.workers,
+    )
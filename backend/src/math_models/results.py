@@ -0,0 +1,77 @@
+"""
+Результат run_simulation.
+
+Траектории хранятся массивами float64 и сериализуются в JSON-байты один раз:
+ответ API отдаётся как есть, без повторной валидации тысяч чисел моделью
+DoseGraphReport. Неудачная оптимизация — отдельный вариант с ok=False и
+текстом ошибки вместо списков None. Счётчики оптимизатора (stats) идут только
+в журнал запросов и в JSON не попадают.
+"""
+import json
+from dataclasses import dataclass, field
+
+import numpy as np
+
+TRAJECTORY_FIELDS = ("t", "V", "Ns", "Nr", "N")
+
+_EMPTY = np.zeros(0)
+
+
+# to_dict кладёт "ok" первым ключом, поэтому успех виден по началу JSON
+_OK_PREFIX = b'{"ok":true'
+
+
+def is_ok_json(raw: bytes) -> bool:
+    """Успешный ли результат в JSON из SimulationResult.to_json, без разбора всего документа"""
+    return raw.startswith(_OK_PREFIX)
+
+
+def _dumps(payload) -> bytes:
+    # allow_nan=False: NaN/inf не попадут в ответ как невалидный JSON
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"), allow_nan=False).encode("utf-8")
+
+
+@dataclass(frozen=True)
+class SimulationResult:
+    """
+    Attributes:
+        ok: False — оптимизация не нашла результата, причина в error
+        t, V, Ns, Nr, N: траектории (пустые при ok=False)
+        doses: {pk_name: {"base_dose", "optimized_dose"}}
+        stats: счётчики оптимизатора (комбинации, nfev, длительность) для журнала
+    """
+    ok: bool
+    t: np.ndarray = field(default_factory=lambda: _EMPTY)
+    V: np.ndarray = field(default_factory=lambda: _EMPTY)
+    Ns: np.ndarray = field(default_factory=lambda: _EMPTY)
+    Nr: np.ndarray = field(default_factory=lambda: _EMPTY)
+    N: np.ndarray = field(default_factory=lambda: _EMPTY)
+    doses: dict = field(default_factory=dict)
+    error: str | None = None
+    stats: dict = field(default_factory=dict, compare=False)
+
+    @classmethod
+    def from_trajectories(cls, doses, stats=None, **trajectories) -> "SimulationResult":
+        return cls(
+            ok=True,
+            doses=doses,
+            stats=stats or {},
+            **{f: np.asarray(trajectories[f], dtype=float) for f in TRAJECTORY_FIELDS},
+        )
+
+    @classmethod
+    def failure(cls, error: str, stats=None) -> "SimulationResult":
+        return cls(ok=False, error=error, stats=stats or {})
+
+    def to_dict(self) -> dict:
+        """Словарь в формате DoseGraphReport / DoseGraphError"""
+        if not self.ok:
+            return {"ok": False, "error": self.error}
+        result = {"ok": True}
+        for f in TRAJECTORY_FIELDS:
+            result[f] = getattr(self, f).tolist()
+        result["doses"] = self.doses
+        return result
+
+    def to_json(self) -> bytes:
+        return _dumps(self.to_dict())
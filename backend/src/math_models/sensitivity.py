@@ -0,0 +1,211 @@
+"""
+Глобальный анализ чувствительности модели (метод Морриса).
+
+Для каждой пары подтип/схема варьирует параметры params_pop, T_cycle_dict и
+E_max/EC50 препаратов схемы в диапазоне nominal * [1 - spread, 1 + spread]
+и считает индексы mu*, mu, sigma для финального объёма V(t_end).
+Все точки траекторий Морриса считаются пакетом через simulate_patients_batch,
+пары подтип/схема — параллельно в отдельных процессах.
+
+Запуск:
+    python -m src.math_models.sensitivity --trajectories 100 --out sensitivity.json
+"""
+import argparse
+import csv
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from loguru import logger
+
+from src.math_models.core import (
+    E_of_C,
+    PK_PD_PARAMS,
+    T_cycle_dict,
+    params_pop,
+    pk_time_grid,
+    r_from_ki67,
+    regimen_concentrations,
+    simulate_patients_batch,
+    to_volume_from_diameter,
+)
+from src.math_models.regimens import REGIMENS, get_regimen
+
+POP_PARAMETERS = ("d", "k_clear", "K", "f_N0")
+BATCH_SIZE = 512
+
+
+def parameter_names(regimen_name) -> list[str]:
+    reg = get_regimen(regimen_name)
+    names = list(POP_PARAMETERS) + ["T_cycle"]
+    for drug in reg.drugs:
+        names += [f"E_max:{drug}", f"EC50:{drug}"]
+    return names
+
+
+def nominal_values(subtype, regimen_name) -> np.ndarray:
+    values = []
+    for name in parameter_names(regimen_name):
+        if name in POP_PARAMETERS:
+            values.append(params_pop[subtype][name])
+        elif name == "T_cycle":
+            values.append(T_cycle_dict[subtype])
+        else:
+            key, drug = name.split(":")
+            values.append(PK_PD_PARAMS[drug][key])
+    return np.array(values, dtype=float)
+
+
+def morris_design(n_params, n_trajectories, rng, levels=4):
+    """
+    Траектории Морриса в единичном кубе
+
+    Returns:
+        X [n_trajectories, n_params + 1, n_params], order [n_trajectories, n_params] —
+        какой параметр меняется на каждом шаге
+    """
+    delta = levels / (2.0 * (levels - 1))
+    base_levels = np.arange(levels // 2) / (levels - 1)
+
+    X = np.empty((n_trajectories, n_params + 1, n_params))
+    order = np.empty((n_trajectories, n_params), dtype=int)
+    for k in range(n_trajectories):
+        x = rng.choice(base_levels, size=n_params)
+        order[k] = rng.permutation(n_params)
+        X[k, 0] = x
+        for step, i in enumerate(order[k]):
+            x = x.copy()
+            x[i] += delta
+            X[k, step + 1] = x
+    return X, order, delta
+
+
+def evaluate_final_volume(subtype, regimen_name, values, ki67_percent, V0):
+    """V(t_end) для пакета наборов параметров values [B, n_params]"""
+    reg = get_regimen(regimen_name)
+    names = parameter_names(regimen_name)
+    col = {name: values[:, i] for i, name in enumerate(names)}
+
+    t_grid = pk_time_grid(reg.horizon)
+    C = regimen_concentrations(reg, {}, t_grid)
+
+    out = np.empty(values.shape[0])
+    for lo in range(0, values.shape[0], BATCH_SIZE):
+        sl = slice(lo, lo + BATCH_SIZE)
+        effect = sum(
+            E_of_C(C[i][None, :], col[f"E_max:{drug}"][sl, None], col[f"EC50:{drug}"][sl, None])
+            for i, drug in enumerate(reg.drugs)
+        )
+        _, V, _, _, _ = simulate_patients_batch(
+            r=r_from_ki67(ki67_percent / 100.0, col["T_cycle"][sl]),
+            K=col["K"][sl],
+            d_base=col["d"][sl],
+            k_clear=col["k_clear"][sl],
+            f_N0=col["f_N0"][sl],
+            V0=V0,
+            effect_grid=effect,
+            t_end=reg.horizon,
+        )
+        out[sl] = V[:, -1]
+    return out
+
+
+def morris_indices(subtype, regimen_name,
+                   n_trajectories=100,
+                   spread=0.5,
+                   ki67_percent=30.0,
+                   tumor_size_cm=2.0,
+                   seed=0):
+    """
+    Индексы Морриса для финального объёма одной пары подтип/схема
+
+    Returns:
+        {parameter: {"mu_star", "mu", "sigma"}}; эффекты нормированы на номинальный V(t_end)
+    """
+    names = parameter_names(regimen_name)
+    nominal = nominal_values(subtype, regimen_name)
+    rng = np.random.default_rng(seed)
+
+    X, order, delta = morris_design(len(names), n_trajectories, rng)
+    values = nominal * (1.0 - spread + 2.0 * spread * X.reshape(-1, len(names)))
+
+    V0 = to_volume_from_diameter(tumor_size_cm)
+    y = evaluate_final_volume(subtype, regimen_name, values, ki67_percent, V0)
+    y_nominal = evaluate_final_volume(subtype, regimen_name, nominal[None, :], ki67_percent, V0)[0]
+    y = y.reshape(n_trajectories, len(names) + 1) / max(y_nominal, 1e-12)
+
+    effects = np.empty((n_trajectories, len(names)))
+    for k in range(n_trajectories):
+        effects[k, order[k]] = np.diff(y[k]) / delta
+
+    return {
+        name: {
+            "mu_star": float(np.abs(effects[:, i]).mean()),
+            "mu": float(effects[:, i].mean()),
+            "sigma": float(effects[:, i].std(ddof=1)) if n_trajectories > 1 else 0.0,
+        }
+        for i, name in enumerate(names)
+    }
+
+
+def _run_pair(subtype, regimen_name, kwargs):
+    started = time.perf_counter()
+    indices = morris_indices(subtype, regimen_name, **kwargs)
+    return subtype, regimen_name, indices, time.perf_counter() - started
+
+
+def run_sensitivity(subtypes=None, regimens=None, workers=None, **kwargs) -> dict:
+    """Параллельно считает индексы для всех пар подтип/схема"""
+    subtypes = list(subtypes or params_pop)
+    regimens = list(regimens or REGIMENS)
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_run_pair, s, r, kwargs) for s in subtypes for r in regimens]
+        for fut in futures:
+            subtype, regimen_name, indices, seconds = fut.result()
+            results.setdefault(subtype, {})[regimen_name] = indices
+            logger.info(f"Чувствительность: {subtype} / {regimen_name} за {seconds:.1f} с")
+    return results
+
+
+def write_csv(results, path):
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(["subtype", "regimen", "parameter", "mu_star", "mu", "sigma"])
+        for subtype, by_regimen in results.items():
+            for regimen_name, indices in by_regimen.items():
+                for name, idx in sorted(indices.items(), key=lambda kv: -kv[1]["mu_star"]):
+                    writer.writerow([subtype, regimen_name, name, idx["mu_star"], idx["mu"], idx["sigma"]])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Анализ чувствительности V(t_end) к параметрам модели (Моррис)")
+    parser.add_argument("--subtype", action="append", help="подтип (можно несколько раз), по умолчанию все")
+    parser.add_argument("--regimen", action="append", help="схема (можно несколько раз), по умолчанию все")
+    parser.add_argument("--trajectories", type=int, default=100)
+    parser.add_argument("--spread", type=float, default=0.5, help="относительная ширина диапазона параметров")
+    parser.add_argument("--ki67", type=float, default=30.0)
+    parser.add_argument("--size", type=float, default=2.0, help="размер опухоли, см")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--out", default="sensitivity.json")
+    parser.add_argument("--csv", default=None)
+    args = parser.parse_args()
+
+    results = run_sensitivity(
+        subtypes=args.subtype,
+        regimens=args.regimen,
+        workers=args.workers,
+        n_trajectories=args.trajectories,
+        spread=args.spread,
+        ki67_percent=args.ki67,
+        tumor_size_cm=args.size,
+        seed=args.seed,
+    )
+    with open(args.out, "w", encoding="utf-8") as fh:
+        json.dump(results, fh, ensure_ascii=False, indent=2)
+    if args.csv:
+        write_csv(results, args.csv)
+    logger.info(f"Индексы чувствительности записаны в {args.out}")
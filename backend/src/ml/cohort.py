@@ -0,0 +1,308 @@
+"""
+Скоринг когорты METABRIC (breast_metabrick.csv).
+
+Колонки METABRIC переводятся в признаки PatientInfo, после чего по каждой
+пациентке считаются предсказание выживаемости (CoxModelPredictor) и динамика
+опухоли (simulate_tumor_dynamic). Данные читаются кусками из колоночного
+кэша (src.ml.datasets), куски считаются параллельно в отдельных процессах и
+пишутся в part-NNNNN.npz; уже посчитанные куски при повторном запуске
+пропускаются, так что прерванный прогон можно продолжить. manifest.json
+фиксирует хэш исходника и размер куска: продолжить прогон с другими
+параметрами нельзя. Ошибка на одной пациентке попадает в колонку error и не
+останавливает прогон. В конце части склеиваются в один колоночный файл
+scores.npz.
+
+Запуск:
+    python -m src.ml.cohort --out src/ml/cohort_scores
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+from src.ml.datasets import load_dataset
+from src.ml.model import registry
+from src.schema.patient_info_schema import PatientInfo, validate_patient_batch
+from src.service.report_service import simulate_tumor_dynamic, simulation_params
+
+METABRIC_CSV = "src/ml/breast_metabrick.csv"
+
+# прокси Ki-67 по PAM50: в METABRIC нет прямого измерения
+KI67_BY_PAM50 = {
+    "LumA": 10.0,
+    "LumB": 30.0,
+    "Her2": 40.0,
+    "Basal": 60.0,
+    "claudin-low": 50.0,
+    "Normal": 10.0,
+}
+DEFAULT_KI67 = 20.0
+
+# схема химио/анти-HER2 терапии, которой симулируется динамика по подтипу
+REGIMEN_BY_SUBTYPE = {
+    "HER2+": "(DC + трастузумаб) × 4–6",
+    "HR+": "AC × 4",
+    "TNBC": "AC × 4 → P × 12",
+}
+
+RESULT_COLUMNS = {
+    "patient_id": str,
+    "stage": int,
+    "subtype": str,
+    "regimen": str,
+    "predicted_survival_months": float,
+    "partial_hazard": float,
+    "tumor_ok": bool,
+    "final_volume": float,
+    "min_volume": float,
+    "observed_os_months": float,
+    "observed_os_event": bool,
+    "error": str,
+}
+
+
+def _is(value, expected) -> bool:
+    return isinstance(value, str) and value == expected
+
+
+def _stage_from_row(row) -> str:
+    stage = row["Tumor Stage"]
+    if pd.notna(stage) and stage >= 1:
+        return str(int(stage))
+    # стадия 0 / неизвестна — оцениваем по размеру (T1 ≤ 2 см, T2 ≤ 5 см)
+    size_mm = row["Tumor Size"]
+    if pd.isna(size_mm) or size_mm <= 20:
+        return "1"
+    return "2" if size_mm <= 50 else "3"
+
+
+def metabric_row_to_patient(row) -> dict:
+    """Переводит строку METABRIC в словарь признаков PatientInfo"""
+    er = _is(row["ER Status"], "Positive")
+    pr = _is(row["PR Status"], "Positive")
+    her2 = _is(row["HER2 Status"], "Positive")
+    post = _is(row["Inferred Menopausal State"], "Post")
+    hormone = _is(row["Hormone Therapy"], "Yes")
+
+    if her2:
+        subtype = "HER2+"
+    elif er or pr:
+        subtype = "HR+"
+    else:
+        subtype = "TNBC"
+
+    size_mm = row["Tumor Size"]
+    nodes = row["Lymph nodes examined positive"]
+    grade = row["Neoplasm Histologic Grade"]
+
+    return {
+        "age": int(round(row["Age at Diagnosis"])),
+        "stage": _stage_from_row(row),
+        "menopausal_status": post,
+        "family_history": False,
+        "er_status": er,
+        "pr_status": pr,
+        "her2_status": her2,
+        "brca_mutation": False,
+        "ki67_level": KI67_BY_PAM50.get(row["Pam50 + Claudin-low subtype"], DEFAULT_KI67),
+        "tnbc": not (er or pr or her2),
+        "harmon": hormone,
+        "surgery_type": _is(row["Type of Breast Surgery"], "Mastectomy"),
+        "HER2_treatment": REGIMEN_BY_SUBTYPE[subtype],
+        "harmon_treatment": ("Летрозол" if post else "Тамоксифен → ингибиторы ароматазы") if hormone else None,
+        "tumor_size_before": int(round(size_mm / 10.0)) if pd.notna(size_mm) else 0,
+        "positive_lymph_nodes": int(min(nodes, 16)) if pd.notna(nodes) else 0,
+        "tumor_grade": int(grade) if pd.notna(grade) else 2,
+        "performance_status": 0,
+        "met_bone": False,
+        "met_brain": False,
+        "met_liver": False,
+        "met_lung": False,
+        "met_none": True,
+    }
+
+
+def score_patient(row, user: PatientInfo | None, error="", with_tumor_dynamics=True) -> dict:
+    """
+    Выживаемость и динамика опухоли одной пациентки
+
+    Args:
+        row: строка METABRIC
+        user: провалидированные признаки (None — строка не прошла валидацию)
+        error: текст ошибки валидации
+    """
+    result = {
+        "patient_id": row["Patient ID"],
+        "observed_os_months": row["Overall Survival (Months)"],
+        "observed_os_event": _is(row["Overall Survival Status"], "Deceased"),
+        "stage": 0,
+        "subtype": "",
+        "regimen": "",
+        "predicted_survival_months": np.nan,
+        "partial_hazard": np.nan,
+        "tumor_ok": False,
+        "final_volume": np.nan,
+        "min_volume": np.nan,
+        "error": error,
+    }
+    if user is None:
+        return result
+
+    stage = int(user.stage)
+    treatment = "surgery_chemo" if _is(row["Chemotherapy"], "Yes") else "surgery_only"
+    params = simulation_params(user)
+    try:
+        survival = registry.current().predict(stage=stage, patient_data=user.model_dump() | {"treatment": treatment})
+    except Exception as exc:
+        result.update(stage=stage, subtype=params["subtype"], regimen=params["regimen"])
+        result["error"] = f"выживаемость: {exc}"
+        return result
+
+    result.update(
+        stage=stage,
+        subtype=params["subtype"],
+        regimen=params["regimen"],
+        predicted_survival_months=survival["predicted_survival_months"],
+        partial_hazard=survival["partial_hazard"],
+    )
+
+    if with_tumor_dynamics:
+        try:
+            dynamic = simulate_tumor_dynamic(params)
+        except Exception as exc:
+            result["error"] = f"динамика опухоли: {exc}"
+            return result
+        if dynamic.ok:
+            result.update(
+                tumor_ok=True,
+                final_volume=float(dynamic.V[-1]),
+                min_volume=float(dynamic.V.min()),
+            )
+    return result
+
+
+def _to_columns(rows: list[dict]) -> dict[str, np.ndarray]:
+    return {
+        name: np.array([r[name] for r in rows], dtype=kind if kind is not str else np.str_)
+        for name, kind in RESULT_COLUMNS.items()
+    }
+
+
+def _score_chunk(part_path, chunk, with_tumor_dynamics):
+    started = time.perf_counter()
+    raw_rows = [row for _, row in chunk.iterrows()]
+
+    patients, conversion_errors = [], {}
+    for i, row in enumerate(raw_rows):
+        try:
+            patients.append(metabric_row_to_patient(row))
+        except (ValueError, TypeError) as exc:
+            conversion_errors[i] = str(exc)
+            patients.append(None)
+
+    # все строки куска валидируются одним проходом TypeAdapter
+    valid = [i for i, p in enumerate(patients) if p is not None]
+    users, validation_errors = validate_patient_batch([patients[i] for i in valid])
+    by_row = dict.fromkeys(range(len(raw_rows)))
+    errors = dict(conversion_errors)
+    for k, i in enumerate(valid):
+        by_row[i] = users[k]
+        if k in validation_errors:
+            errors[i] = validation_errors[k]
+
+    rows = [
+        score_patient(row, by_row[i], errors.get(i, ""), with_tumor_dynamics)
+        for i, row in enumerate(raw_rows)
+    ]
+
+    tmp_path = part_path.with_name(part_path.stem + ".tmp.npz")
+    np.savez(tmp_path, **_to_columns(rows))
+    os.replace(tmp_path, part_path)
+    return part_path, len(rows), time.perf_counter() - started
+
+
+def read_parts(out_dir) -> dict[str, np.ndarray]:
+    parts = sorted(Path(out_dir).glob("part-*.npz"))
+    loaded = [np.load(p) for p in parts if not p.name.endswith(".tmp.npz")]
+    return {name: np.concatenate([part[name] for part in loaded]) for name in RESULT_COLUMNS}
+
+
+def _check_manifest(out_dir: Path, manifest: dict):
+    """Пишет manifest.json; уже посчитанные части с другими параметрами не продолжаются"""
+    path = out_dir / "manifest.json"
+    has_parts = any(out_dir.glob("part-*.npz"))
+    if path.exists():
+        with open(path, "r", encoding="utf-8") as fh:
+            existing = json.load(fh)
+        if has_parts and existing != manifest:
+            raise ValueError(
+                f"Части в {out_dir} посчитаны с другими параметрами ({existing}, сейчас {manifest}); "
+                f"удалите каталог или запустите с теми же параметрами"
+            )
+    elif has_parts:
+        raise ValueError(f"Части в {out_dir} без manifest.json, параметры неизвестны; удалите каталог")
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, ensure_ascii=False)
+
+
+def score_cohort(csv_path=METABRIC_CSV,
+                 out_dir="src/ml/cohort_scores",
+                 chunk_size=250,
+                 workers=None,
+                 with_tumor_dynamics=True) -> Path:
+    """
+    Скорит когорту кусками по chunk_size строк и пишет out_dir/scores.npz
+
+    Returns:
+        путь к итоговому колоночному файлу
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    dataset = load_dataset("metabric", source_path=csv_path)
+    _check_manifest(out_dir, {
+        "source_sha256": dataset.schema["sha256"],
+        "chunk_size": chunk_size,
+        "with_tumor_dynamics": with_tumor_dynamics,
+    })
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = []
+        for i, chunk in enumerate(dataset.iter_chunks(chunk_size)):
+            part_path = out_dir / f"part-{i:05d}.npz"
+            if part_path.exists():
+                logger.info(f"Когорта: {part_path.name} уже посчитан, пропускаем")
+                continue
+            futures.append(pool.submit(_score_chunk, part_path, chunk, with_tumor_dynamics))
+
+        for fut in futures:
+            part_path, n_rows, seconds = fut.result()
+            logger.info(f"Когорта: {part_path.name} — {n_rows} пациенток за {seconds:.1f} с")
+
+    result_path = out_dir / "scores.npz"
+    np.savez(result_path, **read_parts(out_dir))
+    logger.info(f"Результаты когорты записаны в {result_path}")
+    return result_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Скоринг когорты METABRIC моделями выживаемости и динамики опухоли")
+    parser.add_argument("--csv", default=METABRIC_CSV)
+    parser.add_argument("--out", default="src/ml/cohort_scores")
+    parser.add_argument("--chunk-size", type=int, default=250)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--no-tumor-dynamics", action="store_true", help="только выживаемость")
+    args = parser.parse_args()
+
+    score_cohort(
+        csv_path=args.csv,
+        out_dir=args.out,
+        chunk_size=args.chunk_size,
+        workers=args.workers,
+        with_tumor_dynamics=not args.no_tumor_dynamics,
+    )
@@ -0,0 +1,162 @@
+"""
+Колоночный кэш обучающих данных.
+
+breast_cancer_data.xlsx и breast_metabrick.csv один раз разбираются pandas и
+сохраняются в типизированный кэш: по файлу .npy на колонку (строки — как
+категории с int32-кодами) и schema.json. Кэш лежит в директории, ключом
+которой служит sha256 исходного файла, поэтому изменение исходника
+автоматически приводит к пересборке. Чтение идёт через memmap без
+повторного парсинга Excel/CSV.
+
+Запуск (предсборка всех источников):
+    python -m src.ml.datasets
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+SOURCES = {
+    "breast_cancer_data": "src/ml/breast_cancer_data.xlsx",
+    "metabric": "src/ml/breast_metabrick.csv",
+}
+
+CACHE_DIR = "src/ml/.data_cache"
+
+# меняется вместе с форматом кэша или правилами разбора источников
+CACHE_FORMAT = 2
+
+
+def file_hash(path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _read_source(path: Path) -> pd.DataFrame:
+    if path.suffix in (".xlsx", ".xls"):
+        # данные разложены по листам (по стадиям), лист с описанием колонок пропускаем
+        sheets = list(pd.read_excel(path, sheet_name=None).values())
+        columns = list(sheets[0].columns)
+        return pd.concat([s for s in sheets if list(s.columns) == columns], ignore_index=True)
+    return pd.read_csv(path)
+
+
+def _column_to_array(series: pd.Series) -> tuple[np.ndarray, dict]:
+    """Типизированное представление колонки и её описание для schema.json"""
+    if pd.api.types.is_bool_dtype(series):
+        return series.to_numpy(dtype=bool), {"kind": "bool"}
+    if pd.api.types.is_integer_dtype(series):
+        return series.to_numpy(dtype=np.int64), {"kind": "int"}
+    if pd.api.types.is_float_dtype(series):
+        return series.to_numpy(dtype=np.float64), {"kind": "float"}
+
+    cat = pd.Categorical(series.map(lambda v: str(v) if pd.notna(v) else None))
+    return cat.codes.astype(np.int32), {"kind": "category", "categories": [str(c) for c in cat.categories]}
+
+
+def build_cache(name, source_path=None, cache_root=CACHE_DIR) -> Path:
+    """Разбирает источник и атомарно пишет кэш; возвращает директорию кэша"""
+    source_path = Path(source_path or SOURCES[name])
+    digest = file_hash(source_path)
+    cache_root = Path(cache_root)
+    target = cache_root / f"{name}-{digest[:16]}-v{CACHE_FORMAT}"
+    if (target / "schema.json").exists():
+        return target
+
+    df = _read_source(source_path)
+    cache_root.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(prefix=f".{name}-", dir=cache_root))
+
+    columns = []
+    for i, col in enumerate(df.columns):
+        arr, info = _column_to_array(df[col])
+        file_name = f"col_{i:03d}.npy"
+        np.save(tmp_dir / file_name, arr)
+        columns.append({"name": str(col), "file": file_name, **info})
+
+    schema = {
+        "source": str(source_path),
+        "sha256": digest,
+        "format": CACHE_FORMAT,
+        "n_rows": len(df),
+        "columns": columns,
+    }
+    with open(tmp_dir / "schema.json", "w", encoding="utf-8") as fh:
+        json.dump(schema, fh, ensure_ascii=False, indent=2)
+
+    try:
+        os.replace(tmp_dir, target)
+    except OSError:
+        # кэш уже собрал параллельный процесс
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    for stale in cache_root.glob(f"{name}-*"):
+        if stale != target and stale.is_dir():
+            shutil.rmtree(stale, ignore_errors=True)
+
+    logger.info(f"Источник {source_path} закэширован в {target} ({len(df)} строк)")
+    return target
+
+
+class ColumnarDataset:
+    """Кэшированный датасет: колонки открываются через memmap"""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+        with open(self.cache_dir / "schema.json", "r", encoding="utf-8") as fh:
+            self.schema = json.load(fh)
+        self._columns = {c["name"]: c for c in self.schema["columns"]}
+
+    def __len__(self) -> int:
+        return self.schema["n_rows"]
+
+    @property
+    def columns(self) -> list[str]:
+        return list(self._columns)
+
+    def array(self, name) -> np.ndarray:
+        """Сырой memmap колонки (для категорий — коды, -1 = пропуск)"""
+        return np.load(self.cache_dir / self._columns[name]["file"], mmap_mode="r")
+
+    def _series(self, name, rows=slice(None)) -> pd.Series:
+        info = self._columns[name]
+        values = self.array(name)[rows]
+        if info["kind"] == "category":
+            return pd.Series(pd.Categorical.from_codes(values, categories=info["categories"]), name=name)
+        return pd.Series(np.asarray(values), name=name)
+
+    def to_frame(self, columns=None, rows=slice(None)) -> pd.DataFrame:
+        columns = columns or self.columns
+        frame = pd.concat([self._series(c, rows) for c in columns], axis=1)
+        if isinstance(rows, slice) and rows.start:
+            frame.index = pd.RangeIndex(rows.start, rows.start + len(frame))
+        return frame
+
+    def iter_chunks(self, chunk_size, columns=None):
+        for start in range(0, len(self), chunk_size):
+            yield self.to_frame(columns, rows=slice(start, start + chunk_size))
+
+
+def load_dataset(name, source_path=None, cache_root=CACHE_DIR) -> ColumnarDataset:
+    """Открывает кэш источника, собирая его при первом обращении или изменении файла"""
+    return ColumnarDataset(build_cache(name, source_path=source_path, cache_root=cache_root))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сборка колоночного кэша обучающих данных")
+    parser.add_argument("--source", action="append", choices=list(SOURCES), help="по умолчанию все")
+    parser.add_argument("--cache-root", default=CACHE_DIR)
+    args = parser.parse_args()
+
+    for name in args.source or SOURCES:
+        build_cache(name, cache_root=args.cache_root)
@@ -0,0 +1,192 @@
+"""
+Оценка точности моделей выживаемости Кокса на отложенной выборке.
+
+Для каждой стадии считаются c-index, интегральный Brier score (IPCW) и
+калибровочные кривые S(t*) на нескольких горизонтах. Кривые выживаемости
+всех пациенток считаются векторно: базовая выживаемость S0(t) один раз
+переносится на сетку времени, S(t|x) = S0(t) ** partial_hazard(x).
+Отчёт пишется в <models_dir>/reports/evaluation-<версия моделей>.json.
+
+Запуск:
+    python -m src.ml.evaluate --models-dir src/ml/cox_models
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+from lifelines import KaplanMeierFitter
+from lifelines.utils import concordance_index
+from loguru import logger
+
+from src.ml.datasets import load_dataset
+from src.ml.model import CoxModelPredictor
+from src.ml.train import DURATION_COL, EVENT_COL, STAGES, prepare_training_frame, split_stage
+
+DEFAULT_HORIZONS = (12.0, 36.0, 60.0)
+N_GRID = 100
+
+
+def survival_grid(cph, X, t_grid) -> np.ndarray:
+    """S(t|x) [n_patients, n_t] по базовой выживаемости модели"""
+    baseline = cph.baseline_survival_
+    times = baseline.index.to_numpy()
+    S0 = baseline.to_numpy()[:, 0]
+    # ступенчатая функция: значение в последнем моменте события <= t
+    idx = np.searchsorted(times, t_grid, side="right") - 1
+    S0_grid = np.where(idx >= 0, S0[np.clip(idx, 0, None)], 1.0)
+
+    hazard = cph.predict_partial_hazard(X).to_numpy()
+    return S0_grid[None, :] ** hazard[:, None]
+
+
+def _censoring_survival(durations, events):
+    """G(t) — Каплан-Мейер для цензурирования (для весов IPCW)"""
+    kmf = KaplanMeierFitter().fit(durations, event_observed=1 - events)
+
+    def G(t):
+        return np.clip(kmf.survival_function_at_times(np.asarray(t)).to_numpy(), 1e-8, None)
+
+    return G
+
+
+def integrated_brier_score(S, t_grid, durations, events) -> tuple[float, np.ndarray]:
+    """
+    Brier score на сетке и его интеграл (IPCW, Graf et al.)
+
+    Returns:
+        IBS, BS(t) [n_t]
+    """
+    G = _censoring_survival(durations, events)
+    T = durations[:, None]
+    died = (T <= t_grid[None, :]) & (events[:, None] == 1)
+    alive = T > t_grid[None, :]
+
+    w_died = died / G(durations)[:, None]
+    w_alive = alive / G(t_grid)[None, :]
+    bs = (S ** 2 * w_died + (1.0 - S) ** 2 * w_alive).mean(axis=0)
+    ibs = np.trapezoid(bs, t_grid) / (t_grid[-1] - t_grid[0])
+    return float(ibs), bs
+
+
+def calibration_curve(S_at, durations, events, horizon, n_bins=10) -> dict:
+    """Предсказанная и наблюдаемая (Каплан-Мейер) выживаемость по квантильным бинам S(t*)"""
+    edges = np.unique(np.quantile(S_at, np.linspace(0.0, 1.0, n_bins + 1)))
+    bins = np.clip(np.searchsorted(edges, S_at, side="right") - 1, 0, len(edges) - 2)
+
+    predicted, observed, counts = [], [], []
+    kmf = KaplanMeierFitter()
+    for b in range(len(edges) - 1):
+        mask = bins == b
+        if not mask.any():
+            continue
+        kmf.fit(durations[mask], event_observed=events[mask])
+        predicted.append(float(S_at[mask].mean()))
+        observed.append(float(kmf.survival_function_at_times(horizon).iloc[0]))
+        counts.append(int(mask.sum()))
+
+    predicted, observed = np.array(predicted), np.array(observed)
+    return {
+        "horizon": horizon,
+        "predicted": predicted.tolist(),
+        "observed": observed.tolist(),
+        "counts": counts,
+        "mean_abs_error": float(np.average(np.abs(predicted - observed), weights=counts)),
+    }
+
+
+def evaluate_stage(cph, test, horizons=DEFAULT_HORIZONS, n_bins=10) -> dict:
+    durations = test[DURATION_COL].to_numpy(dtype=float)
+    events = test[EVENT_COL].to_numpy(dtype=int)
+    X = test[list(cph.params_.index)]
+
+    # сетка до 90-го перцентиля: в хвосте слишком мало наблюдений для Brier score
+    t_grid = np.linspace(durations.min(), np.quantile(durations, 0.9), N_GRID)
+    S = survival_grid(cph, X, t_grid)
+    ibs, bs = integrated_brier_score(S, t_grid, durations, events)
+
+    horizon_grid = np.asarray(horizons, dtype=float)
+    S_at = survival_grid(cph, X, horizon_grid)
+
+    # то же, что predict_expectation: интеграл S(t|x) по моментам событий обучающей выборки
+    event_times = cph.baseline_survival_.index.to_numpy()
+    expectation = np.trapezoid(survival_grid(cph, X, event_times), event_times, axis=1)
+
+    return {
+        "n": len(test),
+        "c_index": float(concordance_index(durations, -cph.predict_partial_hazard(X).to_numpy(), events)),
+        "integrated_brier_score": ibs,
+        "mae": float(np.abs(expectation - durations).mean()),
+        "brier_curve": {"t": t_grid.tolist(), "brier": bs.tolist()},
+        "calibration": [
+            calibration_curve(S_at[:, k], durations, events, h, n_bins) for k, h in enumerate(horizon_grid)
+        ],
+    }
+
+
+def evaluate_models(models_dir="src/ml/cox_models",
+                    source_path=None,
+                    test_size=0.2,
+                    seed=42,
+                    horizons=DEFAULT_HORIZONS,
+                    n_bins=10,
+                    out_path=None) -> dict:
+    """
+    Оценивает модели всех стадий на отложенной выборке (то же разбиение, что в src.ml.train)
+
+    Returns:
+        отчёт; он же записывается в out_path (по умолчанию рядом с артефактами)
+    """
+    started = time.perf_counter()
+    predictor = CoxModelPredictor(models_dir=str(models_dir))
+    raw = load_dataset("breast_cancer_data", source_path=source_path).to_frame()
+    numeric, _ = prepare_training_frame(raw, encoders=predictor.label_encoders)
+
+    stages = {}
+    for stage in STAGES:
+        cph = predictor.cox_models[stage]
+        _, test = split_stage(numeric, stage, test_size=test_size, seed=seed, features=cph.params_.index)
+        stages[f"stage_{stage}"] = evaluate_stage(cph, test, horizons, n_bins)
+        logger.info(
+            f"Стадия {stage}: c-index={stages[f'stage_{stage}']['c_index']:.3f}, "
+            f"IBS={stages[f'stage_{stage}']['integrated_brier_score']:.3f}"
+        )
+
+    report = {
+        "model_version": predictor.version,
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "test_size": test_size,
+        "seed": seed,
+        "eval_seconds": round(time.perf_counter() - started, 2),
+        "stages": stages,
+    }
+
+    out_path = Path(out_path or Path(models_dir) / "reports" / f"evaluation-{predictor.version}.json")
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(out_path, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, ensure_ascii=False, indent=2)
+    logger.info(f"Отчёт об оценке моделей записан в {out_path} за {report['eval_seconds']} с")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Оценка моделей выживаемости на отложенной выборке")
+    parser.add_argument("--models-dir", default="src/ml/cox_models")
+    parser.add_argument("--source", default=None, help="путь к breast_cancer_data.xlsx")
+    parser.add_argument("--test-size", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--horizons", default=",".join(f"{h:g}" for h in DEFAULT_HORIZONS), help="горизонты калибровки, мес.")
+    parser.add_argument("--bins", type=int, default=10)
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+
+    evaluate_models(
+        models_dir=args.models_dir,
+        source_path=args.source,
+        test_size=args.test_size,
+        seed=args.seed,
+        horizons=tuple(float(h) for h in args.horizons.split(",")),
+        n_bins=args.bins,
+        out_path=args.out,
+    )
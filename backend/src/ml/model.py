@@ -1,7 +1,14 @@
 from pathlib import Path
 import pandas as pd
+import hashlib
 import pickle
 import json
+import threading
+import time
+
+from loguru import logger
+
+from src.config import config
 
 ### послание от бекендера: заберите у мльщика курсор
 
@@ -17,26 +24,33 @@ class CoxModelPredictor:
         self.label_encoders = None
         self.cox_models = {}
         self.metadata = None
+        self.version = None
         
         self._load_components()
     
     def _load_components(self):
-        """Загружает все сохраненные компоненты"""
+        """Загружает все сохраненные компоненты; версия — хэш содержимого файлов"""
+        digest = hashlib.sha256()
+
+        def read(path):
+            raw = path.read_bytes()
+            digest.update(raw)
+            return raw
+
         encoders_path = self.models_dir / "label_encoders.pkl"
-        with open(encoders_path, 'rb') as f:
-            self.label_encoders = pickle.load(f)
-        print(f"✓ Загружено {len(self.label_encoders)} label encoders")
+        self.label_encoders = pickle.loads(read(encoders_path))
+        logger.info(f"Загружено {len(self.label_encoders)} label encoders")
         
         metadata_path = self.models_dir / "models_metadata.json"
-        with open(metadata_path, 'r', encoding='utf-8') as f:
-            self.metadata = json.load(f)
-        print(f"✓ Загружены метаданные для {len(self.metadata)} стадий")
+        self.metadata = json.loads(read(metadata_path).decode('utf-8'))
+        logger.info(f"Загружены метаданные для {len(self.metadata)} стадий")
         
         for stage in [1, 2, 3, 4]:
             model_path = self.models_dir / f"cox_model_stage_{stage}.pkl"
-            with open(model_path, 'rb') as f:
-                self.cox_models[stage] = pickle.load(f)
-            print(f"✓ Загружена модель для стадии {stage}")
+            self.cox_models[stage] = pickle.loads(read(model_path))
+            logger.debug(f"Загружена модель для стадии {stage}")
+
+        self.version = digest.hexdigest()[:12]
     
     def preprocess_data(self, patient_data: dict) -> pd.DataFrame:
         """
@@ -55,7 +69,9 @@ class CoxModelPredictor:
                 df[col] = df[col].fillna("Unknown")
                 
                 if df[col].iloc[0] not in encoder.classes_:
-                    print(f"⚠️  Неизвестное значение '{df[col].iloc[0]}' для {col}, используем '{encoder.classes_[0]}'")
+                    logger.bind(column=col, value=str(df[col].iloc[0])).warning(
+                        f"Неизвестное значение '{df[col].iloc[0]}' для {col}, используем '{encoder.classes_[0]}'"
+                    )
                     df[col] = encoder.classes_[0]
                 
                 df[col] = encoder.transform(df[col])
@@ -93,8 +109,100 @@ class CoxModelPredictor:
             'partial_hazard': float(partial_hazard),
             'stage': stage,
             'model_c_index': self.metadata[f'stage_{stage}']['c_index'],
-            'model_mae': self.metadata[f'stage_{stage}']['mae']
+            'model_mae': self.metadata[f'stage_{stage}']['mae'],
+            'model_version': self.version
         }
 
-predictor = CoxModelPredictor(models_dir="src/ml/cox_models")
+
+class ModelRegistry:
+    """
+    Текущая версия CoxModelPredictor с подменой без перезапуска воркеров
+
+    Новая версия загружается целиком в фоне и подменяет ссылку атомарно:
+    запрос, уже взявший predictor через current(), досчитывается на старой версии.
+    """
+
+    def __init__(self, models_dir: str):
+        self.models_dir = Path(models_dir)
+        self._lock = threading.Lock()
+        self._predictor = CoxModelPredictor(models_dir=str(self.models_dir))
+        self._loaded_at = time.time()
+        self._stamp = self._dir_stamp()
+        self._reloads = 0
+        self._failed_reloads = 0
+        self._last_error = None
+        self._watcher = None
+
+    def current(self) -> CoxModelPredictor:
+        return self._predictor
+
+    @property
+    def version(self) -> str:
+        return self._predictor.version
+
+    def _dir_stamp(self):
+        try:
+            st = (self.models_dir / "models_metadata.json").stat()
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns
+
+    def reload(self) -> dict:
+        """
+        Загружает модели из models_dir и подменяет текущую версию, если она изменилась
+
+        Returns:
+            {"version", "previous_version", "swapped"}
+        """
+        with self._lock:
+            previous = self._predictor.version
+            stamp = self._dir_stamp()
+            try:
+                candidate = CoxModelPredictor(models_dir=str(self.models_dir))
+            except Exception as exc:
+                self._failed_reloads += 1
+                self._last_error = f"{type(exc).__name__}: {exc}"
+                logger.error(f"Не удалось загрузить модели из {self.models_dir}: {self._last_error}")
+                raise
+
+            self._stamp = stamp
+            swapped = candidate.version != previous
+            if swapped:
+                self._predictor = candidate
+                self._loaded_at = time.time()
+                self._reloads += 1
+                logger.info(f"Модели выживаемости обновлены: {previous} -> {candidate.version}")
+            return {"version": candidate.version, "previous_version": previous, "swapped": swapped}
+
+    def _watch(self, interval: float):
+        while True:
+            time.sleep(interval)
+            if self._dir_stamp() in (None, self._stamp):
+                continue
+            try:
+                self.reload()
+            except Exception:
+                # ошибка уже залогирована, повторим на следующем тике
+                continue
+
+    def start_watching(self, interval: float):
+        """Фоновый поток, перезагружающий модели при изменении models_metadata.json"""
+        if interval <= 0 or self._watcher is not None:
+            return
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="model-registry-watch", daemon=True)
+        self._watcher.start()
+
+    def stats(self) -> dict:
+        return {
+            "version": self._predictor.version,
+            "models_dir": str(self.models_dir),
+            "loaded_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self._loaded_at)),
+            "reloads": self._reloads,
+            "failed_reloads": self._failed_reloads,
+            "last_error": self._last_error,
+            "watching": self._watcher is not None,
+        }
+
+
+registry = ModelRegistry(models_dir=config.MODELS_DIR)
 
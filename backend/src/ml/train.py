@@ -0,0 +1,273 @@
+"""
+Обучение моделей выживаемости Кокса по стадиям.
+
+Повторяет препроцессинг из ml/cancer.ipynb (бинаризация menopausal_status,
+признак tnbc, LabelEncoder для строковых колонок) и обучает CoxPHFitter для
+каждой из четырёх стадий. Кросс-валидация штрафа (penalizer) для всех стадий
+идёт одновременно в пуле процессов, финальная модель стадии обучается сразу,
+как только готова её кросс-валидация. Энкодеры, модели и метаданные
+записываются атомарно в формате, который читает CoxModelPredictor.
+
+Запуск:
+    python -m src.ml.train --out src/ml/cox_models
+"""
+import argparse
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from lifelines import CoxPHFitter
+from lifelines.utils import concordance_index
+from loguru import logger
+from sklearn.metrics import mean_absolute_error
+from sklearn.model_selection import KFold, train_test_split
+from sklearn.preprocessing import LabelEncoder
+
+from src.ml.datasets import load_dataset
+
+STAGES = (1, 2, 3, 4)
+DURATION_COL = "survival_months"
+EVENT_COL = "event"
+
+# признаки, которые CoxModelPredictor получает из PatientInfo
+CANDIDATE_FEATURES = (
+    "age",
+    "menopausal_status",
+    "family_history",
+    "er_status",
+    "pr_status",
+    "her2_status",
+    "brca_mutation",
+    "ki67_level",
+    "treatment",
+    "tumor_size_before",
+    "performance_status",
+    "tumor_grade",
+    "positive_lymph_nodes",
+    "tnbc",
+)
+
+DEFAULT_PENALIZERS = (0.01, 0.03, 0.1, 0.3, 1.0)
+
+
+def prepare_training_frame(df: pd.DataFrame, encoders: dict | None = None) -> tuple[pd.DataFrame, dict]:
+    """
+    Препроцессинг исходной таблицы
+
+    Args:
+        df: исходная таблица breast_cancer_data
+        encoders: готовые LabelEncoder (например, из сохранённых артефактов); None — обучить новые
+
+    Returns:
+        числовой DataFrame (признаки, stage, survival_months) и словарь LabelEncoder по колонкам
+    """
+    df = df.copy()
+    df["menopausal_status"] = df["menopausal_status"].astype(object) == "postmenopausal"
+    df["tnbc"] = df["molecular_subtype"].astype(object).fillna("").str.contains("TNBC").astype(int)
+    df = df[list(CANDIDATE_FEATURES) + ["stage", DURATION_COL]]
+
+    fit = encoders is None
+    encoders = {} if fit else encoders
+    for col in df.select_dtypes(include=["object", "category"]).columns:
+        values = df[col].astype(object).fillna("Unknown")
+        if fit:
+            encoders[col] = LabelEncoder().fit(values)
+        df[col] = encoders[col].transform(values).astype(np.uint8)
+
+    bool_cols = df.select_dtypes(include=["bool"]).columns
+    df[bool_cols] = df[bool_cols].astype(int)
+    return df, encoders
+
+
+def _drop_degenerate_features(train: pd.DataFrame, features: list[str]) -> list[str]:
+    """Убирает признаки с нулевой дисперсией и один из пары с корреляцией > 0.95"""
+    variances = train[features].var()
+    features = [f for f in features if variances[f] >= 1e-6]
+
+    corr = train[features].corr().abs().to_numpy()
+    dropped = set()
+    for i in range(len(features)):
+        for j in range(i + 1, len(features)):
+            if corr[i, j] > 0.95:
+                a, b = features[i], features[j]
+                dropped.add(a if variances[a] < variances[b] else b)
+    return [f for f in features if f not in dropped]
+
+
+def _fit(frame: pd.DataFrame, penalizer: float) -> CoxPHFitter:
+    cph = CoxPHFitter(penalizer=penalizer)
+    cph.fit(frame, duration_col=DURATION_COL, event_col=EVENT_COL)
+    return cph
+
+
+def _cv_fold(stage, penalizer, fold, train, valid):
+    started = time.perf_counter()
+    cph = _fit(train, penalizer)
+    score = concordance_index(valid[DURATION_COL], -cph.predict_partial_hazard(valid))
+    return stage, penalizer, fold, float(score), time.perf_counter() - started
+
+
+def _fit_final(stage, penalizer, train, test):
+    started = time.perf_counter()
+    cph = _fit(train, penalizer)
+    X_test = test.drop(columns=[DURATION_COL, EVENT_COL])
+    metrics = {
+        "mae": float(mean_absolute_error(test[DURATION_COL], cph.predict_expectation(X_test))),
+        "c_index": float(concordance_index(test[DURATION_COL], -cph.predict_partial_hazard(test))),
+    }
+    return stage, cph, metrics, time.perf_counter() - started
+
+
+def split_stage(numeric: pd.DataFrame, stage, test_size=0.2, seed=42, features=None):
+    """
+    Обучающая и отложенная выборки стадии
+
+    Args:
+        features: список признаков; None — отфильтровать CANDIDATE_FEATURES по обучающей части
+    """
+    df_stage = numeric[numeric["stage"] == stage].drop(columns=["stage"])
+    df_stage[EVENT_COL] = 1
+    train, test = train_test_split(df_stage, test_size=test_size, random_state=seed)
+
+    if features is None:
+        features = _drop_degenerate_features(train, list(CANDIDATE_FEATURES))
+    columns = list(features) + [DURATION_COL, EVENT_COL]
+    return train[columns], test[columns]
+
+
+def _write_artifacts(out_dir: Path, encoders, models, metadata):
+    out_dir.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(prefix=f".{out_dir.name}_", dir=out_dir.parent))
+
+    with open(tmp_dir / "label_encoders.pkl", "wb") as fh:
+        pickle.dump(encoders, fh)
+    for stage, cph in models.items():
+        with open(tmp_dir / f"cox_model_stage_{stage}.pkl", "wb") as fh:
+            pickle.dump(cph, fh)
+    with open(tmp_dir / "models_metadata.json", "w", encoding="utf-8") as fh:
+        json.dump(metadata, fh, indent=2, ensure_ascii=False)
+
+    # история отчётов src.ml.evaluate переживает переобучение
+    reports_dir = out_dir / "reports"
+    if reports_dir.is_dir():
+        shutil.copytree(reports_dir, tmp_dir / "reports")
+
+    if out_dir.exists():
+        old_dir = out_dir.with_name(out_dir.name + ".old")
+        os.replace(out_dir, old_dir)
+        os.replace(tmp_dir, out_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+    else:
+        os.replace(tmp_dir, out_dir)
+
+
+def train_models(out_dir="src/ml/cox_models",
+                 source_path=None,
+                 penalizers=DEFAULT_PENALIZERS,
+                 n_folds=5,
+                 test_size=0.2,
+                 seed=42,
+                 workers=None) -> dict:
+    """
+    Обучает модели всех стадий и атомарно записывает артефакты в out_dir
+
+    Args:
+        out_dir: директория моделей (перезаписывается целиком, кроме reports/)
+        source_path: путь к breast_cancer_data.xlsx (None — путь по умолчанию)
+        penalizers: сетка штрафа для кросс-валидации
+        n_folds: число фолдов кросс-валидации на обучающей части
+        test_size: доля отложенной выборки для итоговых метрик
+        seed: random_state для разбиения
+        workers: число процессов (None — по числу ядер)
+
+    Returns:
+        метаданные моделей (содержимое models_metadata.json)
+    """
+    started = time.perf_counter()
+    raw = load_dataset("breast_cancer_data", source_path=source_path).to_frame()
+    numeric, encoders = prepare_training_frame(raw)
+    splits = {stage: split_stage(numeric, stage, test_size, seed) for stage in STAGES}
+
+    cv_scores = {stage: {p: [] for p in penalizers} for stage in STAGES}
+    cv_seconds = dict.fromkeys(STAGES, 0.0)
+    pending_folds = dict.fromkeys(STAGES, len(penalizers) * n_folds)
+    models, metadata = {}, {}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for stage, (train, _) in splits.items():
+            folds = KFold(n_splits=n_folds, shuffle=True, random_state=seed).split(train)
+            for fold, (fit_idx, val_idx) in enumerate(folds):
+                for penalizer in penalizers:
+                    fut = pool.submit(_cv_fold, stage, penalizer, fold, train.iloc[fit_idx], train.iloc[val_idx])
+                    futures[fut] = "cv"
+
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for fut in done:
+                if futures.pop(fut) == "cv":
+                    stage, penalizer, _, score, seconds = fut.result()
+                    cv_scores[stage][penalizer].append(score)
+                    cv_seconds[stage] += seconds
+                    pending_folds[stage] -= 1
+                    if pending_folds[stage] == 0:
+                        best = max(penalizers, key=lambda p: np.mean(cv_scores[stage][p]))
+                        logger.info(f"Стадия {stage}: лучший penalizer={best}")
+                        futures[pool.submit(_fit_final, stage, best, *splits[stage])] = "fit"
+                    continue
+
+                stage, cph, metrics, fit_seconds = fut.result()
+                train, test = splits[stage]
+                best = cph.penalizer
+                models[stage] = cph
+                metadata[f"stage_{stage}"] = {
+                    "feature_columns": list(cph.params_.index),
+                    "n_features": len(cph.params_),
+                    "mae": metrics["mae"],
+                    "c_index": metrics["c_index"],
+                    "train_size": len(train),
+                    "test_size": len(test),
+                    "penalizer": best,
+                    "cv_c_index": {str(p): float(np.mean(s)) for p, s in cv_scores[stage].items()},
+                    "cv_seconds": round(cv_seconds[stage], 2),
+                    "fit_seconds": round(fit_seconds, 2),
+                    "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                }
+                logger.info(
+                    f"Стадия {stage}: c-index={metrics['c_index']:.3f}, MAE={metrics['mae']:.2f}, "
+                    f"CV {cv_seconds[stage]:.1f} с, обучение {fit_seconds:.1f} с"
+                )
+
+    metadata = {f"stage_{stage}": metadata[f"stage_{stage}"] for stage in STAGES}
+    _write_artifacts(Path(out_dir), encoders, models, metadata)
+    logger.info(f"Модели записаны в {out_dir} за {time.perf_counter() - started:.1f} с")
+    return metadata
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Обучение моделей выживаемости Кокса по стадиям")
+    parser.add_argument("--out", default="src/ml/cox_models")
+    parser.add_argument("--source", default=None, help="путь к breast_cancer_data.xlsx")
+    parser.add_argument("--penalizers", default=",".join(str(p) for p in DEFAULT_PENALIZERS))
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--test-size", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    train_models(
+        out_dir=args.out,
+        source_path=args.source,
+        penalizers=tuple(float(p) for p in args.penalizers.split(",")),
+        n_folds=args.folds,
+        test_size=args.test_size,
+        seed=args.seed,
+        workers=args.workers,
+    )
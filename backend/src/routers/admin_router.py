@@ -0,0 +1,49 @@
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
+
+from src.math_models.pk_cache import pk_cache
+from src.ml.model import registry
+from src.schema.reports_schema import ModelReloadReport
+from src.service.auth import admin_token_valid
+from src.service.profiling import sampler
+from src.service.report_service import result_store, simulation_flight
+from src.service.warmup import warmup
+
+
+def require_admin(x_admin_token: str = Header(default="")):
+    if not admin_token_valid(x_admin_token):
+        raise HTTPException(status_code=403, detail="Доступ запрещён")
+
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+
+@router.get("/metrics")
+async def get_metrics():
+    return {
+        "models": registry.stats(),
+        "pk_cache": pk_cache.stats(),
+        "simulation_flight": simulation_flight.stats(),
+        "result_store": result_store.stats(),
+        "warmup": warmup.stats(),
+    }
+
+
+@router.post("/models/reload", response_model=ModelReloadReport)
+async def reload_models():
+    # загрузка идёт в пуле потоков, текущие запросы продолжают работать на старой версии
+    try:
+        return await run_in_threadpool(registry.reload)
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=f"Не удалось загрузить модели: {exc}")
+
+
+@router.get("/profile/stacks")
+async def get_profile_stacks(seconds: float | None = None, top: int = 30, format: Literal["json", "collapsed"] = "json"):
+    """Горячие стеки статистического сэмплера за последние seconds секунд"""
+    if format == "collapsed":
+        return PlainTextResponse(sampler.collapsed(seconds))
+    return sampler.report(seconds, top)
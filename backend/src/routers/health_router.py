@@ -0,0 +1,18 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from src.service.warmup import warmup
+
+
+router = APIRouter(prefix="/health", tags=["health"])
+
+
+@router.get("/live")
+async def get_live():
+    return {"status": "ok"}
+
+
+@router.get("/ready")
+async def get_ready():
+    # 503 до окончания прогрева, чтобы балансировщик не слал запросы в холодный воркер
+    return JSONResponse(warmup.stats(), status_code=200 if warmup.ready else 503)
@@ -3,13 +3,19 @@ from typing import Literal
 
 from loguru import logger
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Response
 from src.schema.patient_info_schema import PatientInfo
 from src.schema.reports_schema import TreatmentType, SurvivalMonthReport
-from src.schema.reports_schema import DoseGraphReport
+from src.schema.reports_schema import DoseGraphError, DoseGraphReport, FullReport, ParetoFrontReport, PopulationBandReport
 
-from src.ml.model import predictor as survivor_predictor
-from src.math_models.core import run_simulation, subtype_from_markers
+from src.service.report_service import (
+    build_full_report,
+    predict_survival_async,
+    simulate_tumor_dynamic_async,
+    simulate_tumor_pareto_async,
+    simulate_tumor_population_async,
+    simulation_params,
+)
 
 
 router = APIRouter(prefix="/reports", tags=["reports"])
@@ -19,12 +25,16 @@ router = APIRouter(prefix="/reports", tags=["reports"])
 async def get_survival_month(
     user: PatientInfo,
 ):  
-    user_dict = user.model_dump()
-    stage = int(user_dict["stage"])
-    user_dict = {k: v for k, v in user_dict.items()} | {"treatment":"surgery_chemo"}
-    model_response = survivor_predictor.predict(stage=stage, patient_data=user_dict)
+    return SurvivalMonthReport(**await predict_survival_async(user.model_dump()))
 
-    return SurvivalMonthReport(month=round(model_response.get("predicted_survival_months")))
+
+# ответы с траекториями уже сериализованы в JSON: response_model здесь только для документации,
+# Response возвращается как есть, без повторной валидации тысяч чисел
+@router.post("/full", response_model=FullReport)
+async def get_full_report(
+    user: PatientInfo,
+):
+    return Response(await build_full_report(user), media_type="application/json")
 
 
 ### Честное слово я бы отделил ручки по назначению отдельно для получения графиков, отдельно для получения рекомендуемых доз
@@ -32,20 +42,27 @@ async def get_survival_month(
 ### можно добавление нового поля не будет часовым аттракционом по попытке что-то сгенерить и не сломать все остальное?
 ### памагите, у меня ощущение, что я тут единственный кто понимает что в его коде происходит
 ### кстати, вот мое резюме https://docs.google.com/document/d/1YF_cgOvo5mpiIx7_0mhIQP8dA1k8nsL5OY0Hh1EP3gs/edit?usp=sharing
-@router.post("/tumor_dynamic", response_model=DoseGraphReport)
+@router.post("/tumor_dynamic", response_model=DoseGraphReport | DoseGraphError)
 async def get_tumor_dynamic(
     user: PatientInfo,
 ):  
-    subtype: Literal["HR+", "HER2+", "TNBC"] = subtype_from_markers(er_status=user.er_status,
-                                   pr_status=user.pr_status,
-                                   her2_status=user.her2_status)
-    params = {
-        "subtype": subtype,          
-        "ki67": user.ki67_level,
-        "tumor_size_cm": user.tumor_size_before,
-        "regimen": user.HER2_treatment,
-    }
-    results = run_simulation(params=params)
-    #DoseGraphReport()
-    #logger.info(results)
-    return results
\ No newline at end of file
+    params = simulation_params(user)
+    results = await simulate_tumor_dynamic_async(params=params)
+    return Response(results, media_type="application/json")
+
+
+@router.post("/tumor_dynamic/population", response_model=PopulationBandReport | DoseGraphError)
+async def get_tumor_dynamic_population(
+    user: PatientInfo,
+):
+    return await simulate_tumor_population_async(params=simulation_params(user))
+
+
+@router.post("/tumor_dynamic/pareto", response_model=ParetoFrontReport)
+async def get_tumor_dynamic_pareto(
+    user: PatientInfo,
+):
+    try:
+        return await simulate_tumor_pareto_async(params=simulation_params(user))
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
\ No newline at end of file
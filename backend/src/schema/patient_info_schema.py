@@ -1,39 +1,37 @@
-from pydantic import BaseModel, Field, field_validator
-from typing import Optional, Literal
-
-harmon_type = Literal[
-    "Летрозол",
-    "Анастрозол", 
-    "Фулвестрант",
-    "Бусерелин",
-    "Торемифен",
-    "Тамоксифен → ингибиторы ароматазы"
-]
-
-HER2_type = Literal[
-    "(DC + трастузумаб) × 4–6",
-    "DCН × 6", 
-    "DCН + пертузумаб × 6",
-    "(Р + трастузумаб) × 12",
-    "AC × 4 → (D + трастузумаб) × 4",
-    "AC × 4 → (Р + трастузумаб) × 12",
-    "ddAC × 4 → (Р + трастузумаб) × 12",
-    "ddАС × 4 → (Р + трастузумаб) × 4",
-    "АС × 4 → (таксаны+ трастузумаб + пертузумаб) × 4",
-    "Трастузумаб эмтанзин × 14",
-    "ddАС × 4 → ddP × 4 АС",
-    "ddАC × 4 → P × 12 АС",
-    "ddАC × 4 → P + С × 12 АС", 
-    "DC × 4–6",
-    "AC × 4",
-    "AC × 4 → D × 4",
-    "AC × 4 → P × 12",
-    "Капецитабин (монотерапия)",
-    "Олапариб"
-]
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError, WrapValidator
+from typing import Annotated, Optional, Literal
+
+from src.math_models.regimens import HER2_REGIMEN_NAMES, HORMONE_REGIMEN_NAMES
+
+harmon_type = Literal[HORMONE_REGIMEN_NAMES]
+
+HER2_type = Literal[HER2_REGIMEN_NAMES]
 
 HER2_treatment = Literal
 
+_RANGE_ERRORS = {"greater_than_equal", "less_than_equal"}
+
+
+def _range_message(message):
+    """Проверка ge/le из Field с прежним текстом ошибки вместо стандартного текста pydantic"""
+    def validate(value, handler):
+        try:
+            return handler(value)
+        except ValidationError as exc:
+            if any(err["type"] in _RANGE_ERRORS for err in exc.errors()):
+                raise ValueError(message) from None
+            raise
+    return WrapValidator(validate)
+
+
+TumorSize = Annotated[int, Field(ge=0, le=500), _range_message('tumor_size_before must be in [0...500] range')]
+LymphNodes = Annotated[int, Field(ge=0, le=16), _range_message('positive_lymph_nodes must be in [0...15] range')]
+TumorGrade = Annotated[int, Field(ge=1, le=3), _range_message('tumor_grade must be in [1, 2, 3] range')]
+PerformanceStatus = Annotated[int, Field(ge=0, le=4), _range_message('performance_status must be in [0..4] range')]
+HeightCm = Annotated[float, Field(ge=100, le=250), _range_message('height_cm must be in [100...250] range')]
+WeightKg = Annotated[float, Field(ge=30, le=250), _range_message('weight_kg must be in [30...250] range')]
+
+
 class PatientInfo(BaseModel):
     age: int
     stage: Literal["1", "2", "3", "4"]
@@ -49,39 +47,40 @@ class PatientInfo(BaseModel):
     surgery_type: bool
     HER2_treatment: HER2_type
     harmon_treatment: harmon_type | None
-    tumor_size_before: int
-    positive_lymph_nodes: int
-    tumor_grade: int
-    performance_status: int
+    tumor_size_before: TumorSize
+    positive_lymph_nodes: LymphNodes
+    tumor_grade: TumorGrade
+    performance_status: PerformanceStatus
     met_bone: bool
     met_brain: bool
     met_liver: bool
     met_lung: bool
     met_none: bool
+    height_cm: HeightCm | None = None
+    weight_kg: WeightKg | None = None
+
+
+patient_batch_adapter = TypeAdapter(list[PatientInfo])
+
 
+def validate_patient_batch(rows: list[dict]) -> tuple[list[PatientInfo | None], dict[int, str]]:
+    """
+    Валидирует список пациенток одним проходом TypeAdapter
 
-    @field_validator('tumor_size_before')
-    def tumor_size_before_validate(cls, value):
-        if value not in list(range(0, 501)):
-            raise ValueError('tumor_size_before must be in [0...500] range')
-        return value
-    
-
-    @field_validator('positive_lymph_nodes')
-    def positive_lymph_nodes_validate(cls, value):
-        if value not in list(range(0, 17)):
-            raise ValueError('positive_lymph_nodes must be in [0...15] range')
-        return value
-    
-    @field_validator('tumor_grade')
-    def tumor_grade_validate(cls, value):
-        if value not in list(range(1, 4)):
-            raise ValueError('tumor_grade must be in [1, 2, 3] range')
-        return value
-
-    @field_validator('performance_status')
-    def performance_status_validate(cls, value):
-        if value not in list(range(0, 5)):
-            raise ValueError('performance_status must be in [0..4] range')
-        return value
+    Returns:
+        PatientInfo по индексам (None для невалидных строк) и ошибки по индексам строк
+    """
+    try:
+        return patient_batch_adapter.validate_python(rows), {}
+    except ValidationError as exc:
+        errors = {}
+        for err in exc.errors():
+            index, *field = err["loc"]
+            message = f"{'.'.join(str(f) for f in field)}: {err['msg']}"
+            errors[index] = f"{errors[index]}; {message}" if index in errors else message
 
+    valid = [i for i in range(len(rows)) if i not in errors]
+    users = [None] * len(rows)
+    for i, user in zip(valid, patient_batch_adapter.validate_python([rows[i] for i in valid])):
+        users[i] = user
+    return users, errors
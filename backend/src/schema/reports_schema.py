@@ -1,8 +1,11 @@
+from typing import Literal
+
 from pydantic import BaseModel
 
 
 class SurvivalMonthReport(BaseModel):
     month: int
+    model_version: str | None = None
 
 
 class DrugDrug(BaseModel):
@@ -20,5 +23,51 @@ class DoseGraphReport(BaseModel):
     doses: dict[str, DrugDrug]
 
 
+class DoseGraphError(BaseModel):
+    ok: Literal[False]
+    error: str
+
+
+class PopulationBandReport(BaseModel):
+    ok: bool
+    t: list[float]
+    bands: dict[str, list[float]]
+    n_patients: int
+
+
+class ParetoPoint(BaseModel):
+    dose_multipliers: dict[str, float]
+    efficacy: float
+    toxicity: float
+    auc: dict[str, float]
+    V: list[float]
+
+
+class ParetoFrontReport(BaseModel):
+    ok: bool
+    t: list[float]
+    front: list[ParetoPoint]
+    n_combos: int
+
+
+class ReportTimings(BaseModel):
+    survival: float
+    tumor_dynamic: float
+    total: float
+
+
+class FullReport(BaseModel):
+    survival: SurvivalMonthReport | None
+    tumor_dynamic: DoseGraphReport | DoseGraphError | None
+    errors: dict[str, str]
+    timings_ms: ReportTimings
+
+
+class ModelReloadReport(BaseModel):
+    version: str
+    previous_version: str
+    swapped: bool
+
+
 class TreatmentType(BaseModel):
     pass
\ No newline at end of file
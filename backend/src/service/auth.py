@@ -0,0 +1,9 @@
+import secrets
+
+from src.config import config
+
+
+def admin_token_valid(token: str) -> bool:
+    """Токен совпадает с ADMIN_TOKEN; пустой ADMIN_TOKEN закрывает доступ полностью"""
+    expected = config.ADMIN_TOKEN.get_secret_value()
+    return bool(expected) and secrets.compare_digest(token, expected)
@@ -0,0 +1,183 @@
+"""
+Профилирование в продакшене.
+
+Профиль одного запроса: заголовок X-Profile (cumulative | tottime) вместе с
+X-Admin-Token. Запрос выполняется под cProfile, и вместо обычного ответа
+возвращается текстовый отчёт pstats. С Python 3.12 cProfile работает через
+sys.monitoring на весь процесс: в профиль попадают и потоки пула, где идёт
+симуляция, и другие запросы, выполнявшиеся в это время, а одновременно
+активен только один профиль (второй запрос получает 409). Ответ из хранилища
+результатов или присоединение к чужой симуляции (single-flight) показывают
+только ожидание.
+
+Статистический сэмплер: фоновый поток с частотой PROFILE_SAMPLE_RATE снимает
+стеки всех потоков (sys._current_frames) и агрегирует их по секундам за окно
+PROFILE_WINDOW_SECONDS. Стоимость — один обход стеков за тик, так что его
+можно держать включённым в продакшене на низкой частоте.
+"""
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, deque
+from pathlib import Path
+
+from fastapi.responses import JSONResponse, Response
+
+from src.config import config
+from src.service.auth import admin_token_valid
+
+PROFILE_SORT_KEYS = ("cumulative", "tottime")
+PROFILE_REPORT_LINES = 40
+
+# листья стеков простаивающих потоков (ожидание очереди пула, select event loop, sleep)
+IDLE_FUNCTIONS = {"wait", "select", "poll", "_worker", "sleep", "_watch", "_flush_loop"}
+
+_profiling_request = False
+
+
+def _profile_report(profiler, sort_key) -> str:
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats(sort_key).print_stats(PROFILE_REPORT_LINES)
+    return stream.getvalue()
+
+
+async def profile_middleware(request, call_next):
+    """Профиль запроса по заголовку X-Profile (только с верным X-Admin-Token)"""
+    sort_key = request.headers.get("x-profile")
+    if sort_key is None:
+        return await call_next(request)
+    if not admin_token_valid(request.headers.get("x-admin-token", "")):
+        return JSONResponse({"detail": "Доступ запрещён"}, status_code=403)
+    if sort_key not in PROFILE_SORT_KEYS:
+        sort_key = "cumulative"
+
+    global _profiling_request
+    if _profiling_request:
+        return JSONResponse({"detail": "Уже идёт профилирование другого запроса"}, status_code=409)
+
+    _profiling_request = True
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    profiler.enable()
+    try:
+        response = await call_next(request)
+        # тело ответа дочитывается здесь, чтобы сериализация тоже попала в профиль
+        body = b"".join([chunk async for chunk in response.body_iterator])
+    finally:
+        profiler.disable()
+        _profiling_request = False
+    seconds = time.perf_counter() - started
+
+    report = _profile_report(profiler, sort_key)
+    return Response(
+        report,
+        media_type="text/plain; charset=utf-8",
+        headers={
+            "X-Profiled-Status": str(response.status_code),
+            "X-Profiled-Bytes": str(len(body)),
+            "X-Profile-Seconds": f"{seconds:.4f}",
+        },
+    )
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})"
+
+
+class StackSampler:
+    """Статистический сэмплер стеков всех потоков с агрегацией по секундам"""
+
+    def __init__(self, rate_hz: float, window_seconds: float = 300.0, max_depth: int = 64):
+        self.rate_hz = rate_hz
+        self.window_seconds = window_seconds
+        self.max_depth = max_depth
+
+        self._buckets: deque[tuple[int, Counter]] = deque()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.ticks = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        if self.rate_hz <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        interval = 1.0 / self.rate_hz
+        while not self._stop.wait(interval):
+            self.sample()
+
+    def _stack(self, frame) -> str | None:
+        if frame.f_code.co_name in IDLE_FUNCTIONS:
+            return None
+        labels = []
+        while frame is not None and len(labels) < self.max_depth:
+            labels.append(_frame_label(frame))
+            frame = frame.f_back
+        return ";".join(reversed(labels))
+
+    def sample(self):
+        """Один снимок стеков всех потоков, кроме самого сэмплера"""
+        own = threading.get_ident()
+        stacks = [self._stack(frame) for ident, frame in sys._current_frames().items() if ident != own]
+        second = int(time.time())
+
+        with self._lock:
+            self.ticks += 1
+            if not self._buckets or self._buckets[-1][0] != second:
+                self._buckets.append((second, Counter()))
+            bucket = self._buckets[-1][1]
+            bucket.update(s for s in stacks if s is not None)
+            while self._buckets and self._buckets[0][0] <= second - self.window_seconds:
+                self._buckets.popleft()
+
+    def aggregate(self, seconds: float | None = None) -> Counter:
+        """Счётчики стеков за последние seconds секунд (по умолчанию — всё окно)"""
+        since = time.time() - (seconds if seconds is not None else self.window_seconds)
+        total = Counter()
+        with self._lock:
+            for second, bucket in self._buckets:
+                if second >= since:
+                    total.update(bucket)
+        return total
+
+    def report(self, seconds: float | None = None, top: int = 30) -> dict:
+        stacks = self.aggregate(seconds)
+        n = sum(stacks.values())
+        leaves = Counter()
+        for stack, count in stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return {
+            "running": self.running,
+            "rate_hz": self.rate_hz,
+            "window_seconds": self.window_seconds,
+            "ticks": self.ticks,
+            "samples": n,
+            "stacks": [{"stack": s, "count": c, "share": c / n} for s, c in stacks.most_common(top)],
+            "leaf_functions": [{"function": f, "count": c, "share": c / n} for f, c in leaves.most_common(top)],
+        }
+
+    def collapsed(self, seconds: float | None = None) -> str:
+        """Стеки в формате collapsed ("a;b;c N") для flamegraph.pl и speedscope"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.aggregate(seconds).most_common())
+
+
+sampler = StackSampler(rate_hz=config.PROFILE_SAMPLE_RATE, window_seconds=config.PROFILE_WINDOW_SECONDS)
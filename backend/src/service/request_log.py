@@ -0,0 +1,78 @@
+"""
+Журнал запросов.
+
+Все записи loguru идут через очередь (enqueue=True): запись в stderr делает
+отдельный поток, и обработчик запроса не ждёт вывода. LOG_JSON=1 включает
+JSON-строки со всеми полями bind/contextualize.
+
+На каждый запрос пишется одна строка: request_id (из X-Request-ID или новый),
+метод, путь, статус, длительность и поля, которые по ходу запроса добавил
+annotate (схема, подтип, источник результата, счётчики оптимизатора).
+REQUEST_LOG_SAMPLE_RATE задаёт долю запросов в журнале (0 — выключено),
+ответы 5xx пишутся всегда. Поля живут в ContextVar, поэтому annotate
+работает и из пула потоков.
+"""
+import random
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+
+from loguru import logger
+
+from src.config import config
+
+# пробы балансировщика не засоряют журнал
+UNLOGGED_PREFIXES = ("/health",)
+
+_request_fields: ContextVar[dict | None] = ContextVar("request_fields", default=None)
+
+
+def setup_logging():
+    """Единственный обработчик loguru — неблокирующий вывод в stderr"""
+    logger.remove()
+    logger.add(
+        sys.stderr,
+        level=config.LOG_LEVEL,
+        serialize=config.LOG_JSON,
+        enqueue=True,
+        backtrace=False,
+    )
+
+
+def annotate(**fields):
+    """Добавляет поля в строку журнала текущего запроса; вне запроса ничего не делает"""
+    current = _request_fields.get()
+    if current is not None:
+        current.update(fields)
+
+
+def _format_fields(fields: dict) -> str:
+    return " ".join(f"{key}={value}" for key, value in fields.items())
+
+
+async def request_log_middleware(request, call_next):
+    """Одна строка журнала на запрос с request_id в заголовке ответа"""
+    request_id = request.headers.get("x-request-id") or uuid.uuid4().hex[:16]
+    fields = {}
+    token = _request_fields.set(fields)
+    started = time.perf_counter()
+    status = 500
+    try:
+        with logger.contextualize(request_id=request_id):
+            response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Request-ID"] = request_id
+        return response
+    finally:
+        _request_fields.reset(token)
+        path = request.url.path
+        sampled = config.REQUEST_LOG_SAMPLE_RATE > 0 and random.random() < config.REQUEST_LOG_SAMPLE_RATE
+        if (sampled and not path.startswith(UNLOGGED_PREFIXES)) or status >= 500:
+            record = {
+                "method": request.method,
+                "path": path,
+                "status": status,
+                "ms": round((time.perf_counter() - started) * 1000.0, 1),
+            } | fields
+            logger.bind(request_id=request_id, **record).info(f"request {request_id} {_format_fields(record)}")
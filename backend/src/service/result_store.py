@@ -0,0 +1,175 @@
+"""
+Персистентное хранилище результатов расчётов в MongoDB.
+
+Результат сохраняется под sha256 от канонического JSON входных данных, вида
+расчёта и версии модели (версия моделей Кокса для выживаемости,
+SIMULATION_VERSION для динамики опухоли), так что смена модели сама по себе
+инвалидирует старые записи. Запись буферизуется и уходит пачкой bulk_write в
+фоновой задаче; устаревшие документы удаляет TTL-индекс по created_at.
+
+Коллекция передаётся снаружи (AsyncIOMotorCollection или совместимый объект с
+find_one / bulk_write / create_index), без коллекции хранилище выключено.
+Ошибки MongoDB не роняют запрос: чтение считается промахом, запись — потерянной.
+Неудачные результаты (cacheable вернул False) не сохраняются, чтобы временный
+сбой не отдавался весь TTL.
+"""
+import asyncio
+import hashlib
+import json
+from datetime import datetime, timezone
+
+from loguru import logger
+from pymongo import ReplaceOne
+
+# меняется при изменении формата документов
+RESULT_STORE_FORMAT = 2
+
+
+def content_key(kind: str, payload, version) -> str:
+    """sha256 канонического JSON входных данных расчёта"""
+    canonical = json.dumps(
+        {"kind": kind, "format": RESULT_STORE_FORMAT, "version": version, "payload": payload},
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResultStore:
+    def __init__(self, collection=None, ttl_seconds=7 * 24 * 3600, batch_size=100, flush_interval=1.0):
+        """
+        Args:
+            collection: коллекция MongoDB; None — хранилище выключено
+            ttl_seconds: время жизни записи (TTL-индекс по created_at)
+            batch_size: размер буфера, при котором запись уходит сразу
+            flush_interval: период фоновой записи буфера, с
+        """
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._pending: dict[str, dict] = {}
+        self._flusher: asyncio.Task | None = None
+        # ссылки на сбросы полного буфера, иначе задачу может собрать сборщик мусора
+        self._flush_tasks: set[asyncio.Task] = set()
+        self._flush_lock = asyncio.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.written = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.collection is not None
+
+    async def start(self):
+        """Создаёт TTL-индекс и запускает фоновую запись буфера"""
+        if not self.enabled or self._flusher is not None:
+            return
+        try:
+            await self.collection.create_index("created_at", expireAfterSeconds=self.ttl_seconds)
+        except Exception as exc:
+            self.errors += 1
+            logger.warning(f"Хранилище результатов: не удалось создать TTL-индекс: {exc}")
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Останавливает фоновую запись, дожидается начатых сбросов и сбрасывает остаток буфера"""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        if self._flush_tasks:
+            await asyncio.gather(*self._flush_tasks)
+        await self.flush()
+
+    async def get(self, key: str):
+        if not self.enabled:
+            return None
+        pending = self._pending.get(key)
+        if pending is not None:
+            self.hits += 1
+            return pending["result"]
+        try:
+            doc = await self.collection.find_one({"_id": key}, {"result": 1})
+        except Exception as exc:
+            self.errors += 1
+            logger.warning(f"Хранилище результатов: ошибка чтения {key[:12]}: {exc}")
+            return None
+        if doc is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return doc["result"]
+
+    def put(self, key: str, kind: str, result):
+        if not self.enabled:
+            return
+        self._pending[key] = {
+            "_id": key,
+            "kind": kind,
+            "result": result,
+            "created_at": datetime.now(timezone.utc),
+        }
+        if len(self._pending) >= self.batch_size:
+            task = asyncio.get_running_loop().create_task(self.flush())
+            self._flush_tasks.add(task)
+            task.add_done_callback(self._flush_tasks.discard)
+
+    async def flush(self):
+        """Записывает буфер одной пачкой bulk_write"""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+            try:
+                await self.collection.bulk_write(
+                    [ReplaceOne({"_id": key}, doc, upsert=True) for key, doc in batch.items()],
+                    ordered=False,
+                )
+            except Exception as exc:
+                self.errors += 1
+                logger.warning(f"Хранилище результатов: не записано {len(batch)} результатов: {exc}")
+                return
+            self.written += len(batch)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def get_or_compute(self, key: str, kind: str, compute, cacheable=None):
+        """
+        Результат из хранилища или await compute() с сохранением
+
+        Args:
+            compute: функция без аргументов, возвращающая корутину с результатом
+                (BSON-совместимое значение: dict или готовые JSON-байты)
+            cacheable: предикат результата; False — результат не сохраняется
+        """
+        cached = await self.get(key)
+        if cached is not None:
+            return cached
+        result = await compute()
+        if cacheable is None or cacheable(result):
+            self.put(key, kind, result)
+        return result
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "pending": len(self._pending),
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "written": self.written,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,58 @@
+"""
+Схлопывание одинаковых одновременных вычислений (single-flight).
+
+Первый запрос с данным ключом запускает вычисление в пуле потоков, остальные,
+пришедшие до его завершения, ждут ту же задачу и получают тот же результат.
+Вычисление идёт отдельной задачей: отмена одного из ожидающих запросов
+(например, клиент закрыл соединение) не отменяет его для остальных.
+"""
+import asyncio
+from collections.abc import Hashable
+
+from fastapi.concurrency import run_in_threadpool
+
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.executed = 0
+        self.coalesced = 0
+
+    async def run(self, key: Hashable, func, *args):
+        """
+        Выполняет func(*args) или присоединяется к уже идущему вычислению с тем же ключом
+
+        Args:
+            key: канонический ключ вычисления
+            func: синхронная функция (выполняется в пуле потоков)
+
+        Returns:
+            результат func; исключение пробрасывается всем ожидающим
+        """
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self.executed += 1
+            task = asyncio.ensure_future(run_in_threadpool(func, *args))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # исключение забирается здесь, чтобы не было предупреждения, если все ожидающие отменены
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+            "coalesced_rate": self.coalesced / self.calls if self.calls else 0.0,
+        }
@@ -0,0 +1,127 @@
+"""
+Прогрев кэшей после старта воркера.
+
+Режим задаётся WARMUP:
+    off  — без прогрева, воркер готов сразу;
+    pk   — единичные PK-кривые (pk_unit_curve) всех схем, которые запрашивает
+           simulation_params, включая комбинации с гормонотерапией (pk_cache);
+    full — плюс run_simulation для типичных случаев из WARMUP_CASES
+           (результаты попадают в хранилище результатов).
+Прогрев идёт фоновой задачей, готовность отдаёт /health/ready.
+"""
+import time
+
+from fastapi.concurrency import run_in_threadpool
+from loguru import logger
+
+from src.config import config
+from src.math_models.core import (
+    DEFAULT_BSA,
+    pk_curve_key,
+    pk_time_grid,
+    regimen_concentrations,
+)
+from src.math_models.regimens import COMBINED_SEPARATOR, combined_regimen_name, get_regimen, patient_regimen_names
+from src.service.report_service import simulate_tumor_dynamic_async
+
+WARMUP_MODES = ("off", "pk", "full")
+
+# самые частые пары подтип / схема
+WARMUP_CASES = (
+    ("HR+", "AC × 4"),
+    ("HER2+", "(DC + трастузумаб) × 4–6"),
+    ("HER2+", "AC × 4 → D × 4"),
+    ("TNBC", "AC × 4 → P × 12"),
+    ("HR+", combined_regimen_name("AC × 4", "Летрозол")),
+)
+WARMUP_KI67 = 30.0
+WARMUP_TUMOR_SIZE_CM = 2.0
+
+
+class Warmup:
+    def __init__(self):
+        self.mode = None
+        self.state = "pending"
+        self.started_at = None
+        self.finished_at = None
+        self.pk_curves = 0
+        self.simulations = 0
+        self.errors: list[str] = []
+
+    @property
+    def ready(self) -> bool:
+        return self.state in ("done", "failed")
+
+    def warm_pk_curves(self):
+        """Единичные кривые pk_unit_curve в тех ключах, что читают оптимизаторы доз"""
+        seen = set()
+        for name in patient_regimen_names():
+            reg = get_regimen(name)
+            t_grid = pk_time_grid(reg.horizon)
+            regimen_concentrations(reg, {}, t_grid)
+            for i, pk_name in enumerate(reg.drugs):
+                mask = reg.event_drug == i
+                seen.add(pk_curve_key(pk_name, reg.event_time[mask], reg.event_dose[mask], t_grid))
+        self.pk_curves = len(seen)
+
+    async def warm_simulations(self):
+        for subtype, regimen in WARMUP_CASES:
+            params = {
+                "subtype": subtype,
+                "ki67": WARMUP_KI67,
+                "tumor_size_cm": WARMUP_TUMOR_SIZE_CM,
+                "regimen": regimen,
+                "bsa": DEFAULT_BSA,
+                # как в simulation_params: у комбинированных схем свой режим подбора
+                "dose_search": config.COMBINED_DOSE_SEARCH if COMBINED_SEPARATOR in regimen else config.DOSE_SEARCH,
+            }
+            try:
+                await simulate_tumor_dynamic_async(params)
+                self.simulations += 1
+            except Exception as exc:
+                self.errors.append(f"{subtype} / {regimen}: {exc}")
+                logger.warning(f"Прогрев: симуляция {subtype} / {regimen} не удалась: {exc}")
+
+    async def run(self, mode: str):
+        """Прогрев в режиме mode; ошибки, в том числе неизвестный режим, не мешают воркеру стать готовым"""
+        self.mode = mode
+        self.started_at = time.time()
+        if mode not in WARMUP_MODES:
+            self.state, self.finished_at = "failed", self.started_at
+            self.errors.append(f"Неизвестный режим прогрева {mode}, ожидается один из {WARMUP_MODES}")
+            logger.error(self.errors[-1])
+            return
+        if mode == "off":
+            self.state, self.finished_at = "done", self.started_at
+            return
+
+        self.state = "running"
+        try:
+            await run_in_threadpool(self.warm_pk_curves)
+            if mode == "full":
+                await self.warm_simulations()
+        except Exception as exc:
+            self.state = "failed"
+            self.errors.append(str(exc))
+            logger.exception("Прогрев завершился с ошибкой")
+        else:
+            self.state = "done"
+        self.finished_at = time.time()
+        logger.info(
+            f"Прогрев ({mode}): {self.pk_curves} PK-кривых, {self.simulations} симуляций "
+            f"за {self.finished_at - self.started_at:.1f} с"
+        )
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "state": self.state,
+            "ready": self.ready,
+            "pk_curves": self.pk_curves,
+            "simulations": self.simulations,
+            "seconds": round((self.finished_at or time.time()) - self.started_at, 2) if self.started_at else None,
+            "errors": self.errors,
+        }
+
+
+warmup = Warmup()
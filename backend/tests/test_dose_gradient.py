@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from src.math_models.core import (
+    final_volume_and_gradient,
+    optimize_frontend_regimen_continuous,
+    to_volume_from_diameter,
+)
+from src.math_models.regimens import get_regimen
+
+FD_STEP = 1e-4
+
+
+@pytest.mark.parametrize(
+    "regimen, subtype, ki67, scale",
+    [
+        ("AC × 4 → D × 4", "HR+", 30.0, 1.0),
+        ("AC × 4 → D × 4", "TNBC", 60.0, 0.85),
+        ("(DC + трастузумаб) × 4–6", "HER2+", 40.0, 1.15),
+    ],
+)
+def test_gradient_matches_central_differences(regimen, subtype, ki67, scale):
+    V0 = to_volume_from_diameter(2.0)
+    drugs = get_regimen(regimen).drugs
+    multipliers = dict.fromkeys(drugs, scale)
+
+    _, grad = final_volume_and_gradient(regimen, subtype, ki67, V0, multipliers)
+
+    for i, drug in enumerate(drugs):
+        up, _ = final_volume_and_gradient(regimen, subtype, ki67, V0, multipliers | {drug: scale + FD_STEP})
+        down, _ = final_volume_and_gradient(regimen, subtype, ki67, V0, multipliers | {drug: scale - FD_STEP})
+        fd = (up - down) / (2.0 * FD_STEP)
+        assert grad[i] == pytest.approx(fd, rel=1e-5, abs=1e-9), drug
+
+
+def test_gradient_of_fixed_drug_in_combined_regimen_is_finite():
+    regimen = "AC × 4 → D × 4 | Летрозол"
+    drugs = get_regimen(regimen).drugs
+    V, grad = final_volume_and_gradient(regimen, "HR+", 30.0, to_volume_from_diameter(2.0), {})
+
+    assert V > 0
+    assert grad.shape == (len(drugs),)
+    assert np.all(np.isfinite(grad))
+
+
+def test_continuous_score_is_the_minimised_objective():
+    regimen, subtype, ki67 = "AC × 4 → D × 4 | Летрозол", "HR+", 30.0
+    V0 = to_volume_from_diameter(2.0)
+    best = optimize_frontend_regimen_continuous(regimen, subtype, ki67, V0)
+
+    V_end, _ = final_volume_and_gradient(regimen, subtype, ki67, V0, best["dose_multipliers"])
+
+    assert best["score"] == pytest.approx(V_end, rel=1e-12)
+    assert best["V"][-1] == best["score"]
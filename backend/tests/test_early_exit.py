@@ -0,0 +1,25 @@
+import pytest
+
+from src.math_models.core import optimize_frontend_regimen, to_volume_from_diameter
+
+
+@pytest.mark.parametrize(
+    "regimen, subtype, ki67",
+    [
+        ("AC × 4", "HR+", 20.0),
+        ("AC × 4 → D × 4", "HR+", 30.0),
+        ("AC × 4 → P × 12", "TNBC", 60.0),
+        ("(DC + трастузумаб) × 4–6", "HER2+", 40.0),
+        ("AC × 4 → D × 4 | Летрозол", "HR+", 15.0),
+    ],
+)
+def test_early_exit_keeps_the_full_search_optimum(regimen, subtype, ki67):
+    V0 = to_volume_from_diameter(2.0)
+
+    pruned = optimize_frontend_regimen(regimen, subtype, ki67, V0, early_exit=True)
+    full = optimize_frontend_regimen(regimen, subtype, ki67, V0, early_exit=False)
+
+    assert pruned["dose_multipliers"] == full["dose_multipliers"]
+    assert pruned["score"] == pytest.approx(full["score"], rel=1e-9)
+    assert full["pruning"]["simulated"] == full["pruning"]["combos"]
+    assert pruned["pruning"]["ode_nfev"] <= full["pruning"]["ode_nfev"]
@@ -0,0 +1,200 @@
+import asyncio
+
+import pytest
+
+from src.math_models.results import is_ok_json
+from src.service.result_store import ResultStore, content_key
+
+
+class FakeCollection:
+    """Коллекция Motor в памяти: find_one / bulk_write (ReplaceOne) / create_index"""
+
+    def __init__(self, fail_reads=False, fail_writes=False, fail_index=False):
+        self.docs = {}
+        self.indexes = []
+        self.bulk_calls = []
+        self.fail_reads = fail_reads
+        self.fail_writes = fail_writes
+        self.fail_index = fail_index
+
+    async def find_one(self, query, projection=None):
+        if self.fail_reads:
+            raise ConnectionError("mongod недоступен")
+        doc = self.docs.get(query["_id"])
+        if doc is None:
+            return None
+        return {"_id": doc["_id"], **{name: doc[name] for name in projection or doc}}
+
+    async def bulk_write(self, requests, ordered=True):
+        if self.fail_writes:
+            raise ConnectionError("mongod недоступен")
+        self.bulk_calls.append(len(requests))
+        for op in requests:
+            self.docs[op._filter["_id"]] = op._doc
+
+    async def create_index(self, key, **options):
+        if self.fail_index:
+            raise ConnectionError("mongod недоступен")
+        self.indexes.append((key, options))
+
+
+def counting(result):
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return result
+
+    return compute, calls
+
+
+def test_get_or_compute_miss_then_hit():
+    async def scenario():
+        collection = FakeCollection()
+        store = ResultStore(collection)
+        compute, calls = counting({"month": 42})
+
+        assert await store.get_or_compute("k", "survival", compute) == {"month": 42}
+        await store.flush()
+        # новый экземпляр: ответ из коллекции, а не из буфера
+        fresh = ResultStore(collection)
+        assert await fresh.get_or_compute("k", "survival", compute) == {"month": 42}
+        return store, fresh, calls
+
+    store, fresh, calls = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert store.stats()["misses"] == 1
+    assert fresh.stats()["hits"] == 1
+
+
+def test_pending_result_is_served_before_flush():
+    async def scenario():
+        collection = FakeCollection()
+        store = ResultStore(collection)
+        compute, calls = counting(b'{"ok":true}')
+        await store.get_or_compute("k", "tumor_dynamic", compute)
+        result = await store.get_or_compute("k", "tumor_dynamic", compute)
+        return collection, result, calls
+
+    collection, result, calls = asyncio.run(scenario())
+    assert result == b'{"ok":true}'
+    assert len(calls) == 1
+    assert collection.bulk_calls == []
+
+
+def test_flush_writes_one_bulk_batch():
+    async def scenario():
+        collection = FakeCollection()
+        store = ResultStore(collection, batch_size=1000)
+        for i in range(5):
+            store.put(f"k{i}", "survival", {"month": i})
+        await store.flush()
+        await store.flush()
+        return collection, store
+
+    collection, store = asyncio.run(scenario())
+    assert collection.bulk_calls == [5]
+    assert set(collection.docs) == {f"k{i}" for i in range(5)}
+    assert collection.docs["k3"]["kind"] == "survival"
+    assert "created_at" in collection.docs["k3"]
+    assert store.stats()["written"] == 5
+    assert store.stats()["pending"] == 0
+
+
+def test_full_buffer_flushes_without_waiting_for_timer():
+    async def scenario():
+        collection = FakeCollection()
+        store = ResultStore(collection, batch_size=3, flush_interval=3600)
+        for i in range(3):
+            store.put(f"k{i}", "survival", {"month": i})
+        assert len(store._flush_tasks) == 1
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        return collection, store
+
+    collection, store = asyncio.run(scenario())
+    assert collection.bulk_calls == [3]
+    assert store._flush_tasks == set()
+
+
+def test_stop_waits_for_started_flushes():
+    async def scenario():
+        collection = FakeCollection()
+        store = ResultStore(collection, batch_size=2, flush_interval=3600)
+        await store.start()
+        for i in range(2):
+            store.put(f"k{i}", "survival", {"month": i})
+        await store.stop()
+        return collection, store
+
+    collection, store = asyncio.run(scenario())
+    assert set(collection.docs) == {"k0", "k1"}
+    assert store._flush_tasks == set()
+
+
+def test_start_creates_ttl_index_and_stop_flushes():
+    async def scenario():
+        collection = FakeCollection()
+        store = ResultStore(collection, ttl_seconds=60, flush_interval=3600)
+        await store.start()
+        store.put("k", "survival", {"month": 1})
+        await store.stop()
+        return collection
+
+    collection = asyncio.run(scenario())
+    assert collection.indexes == [("created_at", {"expireAfterSeconds": 60})]
+    assert "k" in collection.docs
+
+
+def test_failed_results_are_not_persisted():
+    async def scenario():
+        collection = FakeCollection()
+        store = ResultStore(collection)
+        compute, calls = counting(b'{"ok":false,"error":"timeout"}')
+        for _ in range(2):
+            await store.get_or_compute("k", "tumor_dynamic", compute, cacheable=is_ok_json)
+        await store.flush()
+        return collection, calls
+
+    collection, calls = asyncio.run(scenario())
+    assert len(calls) == 2
+    assert collection.docs == {}
+
+
+def test_disabled_store_always_computes():
+    async def scenario():
+        store = ResultStore(None)
+        compute, calls = counting({"month": 1})
+        await store.start()
+        for _ in range(2):
+            await store.get_or_compute("k", "survival", compute)
+        await store.stop()
+        return store, calls
+
+    store, calls = asyncio.run(scenario())
+    assert len(calls) == 2
+    assert store.stats()["enabled"] is False
+
+
+@pytest.mark.parametrize("failure", ["fail_reads", "fail_writes", "fail_index"])
+def test_mongo_errors_do_not_fail_requests(failure):
+    async def scenario():
+        collection = FakeCollection(**{failure: True})
+        store = ResultStore(collection, flush_interval=3600)
+        await store.start()
+        compute, calls = counting({"month": 7})
+        result = await store.get_or_compute("k", "survival", compute)
+        await store.stop()
+        return store, result, calls
+
+    store, result, calls = asyncio.run(scenario())
+    assert result == {"month": 7}
+    assert len(calls) == 1
+    assert store.stats()["errors"] == 1
+
+
+def test_content_key_is_canonical_and_versioned():
+    a = content_key("survival", {"age": 50, "stage": "2"}, "v1")
+    assert a == content_key("survival", {"stage": "2", "age": 50}, "v1")
+    assert a != content_key("survival", {"age": 50, "stage": "2"}, "v2")
+    assert a != content_key("tumor_dynamic", {"age": 50, "stage": "2"}, "v1")
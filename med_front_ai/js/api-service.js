@@ -7,54 +7,34 @@ const ApiService = {
         console.log('📤 Отправляемые данные:', patientData);
 
         try {
-            const [survivalResponse, tumorResponse] = await Promise.all([
-                fetch('http://89.169.174.45:8010/reports/survival_month', {
-                    method: 'POST',
-                    headers: {
-                        'accept': 'application/json',
-                        'Content-Type': 'application/json',
-                    },
-                    body: JSON.stringify(patientData)
-                }),
-                fetch('http://89.169.174.45:8010/reports/tumor_dynamic', {
-                    method: 'POST',
-                    headers: {
-                        'accept': 'application/json',
-                        'Content-Type': 'application/json',
-                    },
-                    body: JSON.stringify(patientData)
-                })
-            ]);
-
-            console.log('📥 Статус ответа выживаемости:', survivalResponse.status);
-            console.log('📥 Статус ответа динамики:', tumorResponse.status);
+            const response = await fetch('http://89.169.174.45:8010/reports/full', {
+                method: 'POST',
+                headers: {
+                    'accept': 'application/json',
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify(patientData)
+            });
 
-            let survivalData = null;
-            let tumorData = null;
+            console.log('📥 Статус ответа:', response.status);
 
-            if (survivalResponse.ok) {
-                survivalData = await survivalResponse.json();
-                console.log('📊 Данные выживаемости:', survivalData);
-            } else {
-                console.warn('⚠️ Ошибка получения данных выживаемости:', survivalResponse.status);
+            if (!response.ok) {
+                const errorText = await response.text();
+                throw new Error(`Бэкенд вернул ${response.status}: ${errorText}`);
             }
 
-            if (tumorResponse.ok) {
-                tumorData = await tumorResponse.json();
-                console.log('📊 Данные динамики опухоли:', tumorData);
-            } else {
-                const errorText = await tumorResponse.text();
-                console.warn('⚠️ Ошибка получения данных динамики:', tumorResponse.status, errorText);
+            const report = await response.json();
+            console.log('📊 Полный отчёт:', report);
+
+            for (const [section, message] of Object.entries(report.errors || {})) {
+                console.warn(`⚠️ Ошибка раздела ${section}:`, message);
             }
 
-            if (!survivalData && !tumorData) {
+            if (!report.survival && !report.tumor_dynamic) {
                 throw new Error('Бэкенд не вернул данные для отображения');
             }
 
-            Recommendations.displayBackendResult({
-                survival: survivalData,
-                tumor_dynamic: tumorData
-            });
+            Recommendations.displayBackendResult(report);
             showNotification('Анализ завершен успешно!', 'success');
             
         } catch (error) {
@@ -212,6 +212,22 @@ const FormHandler = {
             return false;
         }
 
+        // Рост и вес необязательны: без них доза считается на стандартную площадь тела
+        const heightField = document.getElementById('heightCm');
+        const weightField = document.getElementById('weightKg');
+        const height = heightField ? parseFloat(heightField.value) : NaN;
+        const weight = weightField ? parseFloat(weightField.value) : NaN;
+
+        if (Number.isFinite(height) && (height < 100 || height > 250)) {
+            showNotification('Рост должен быть от 100 до 250 см', 'error');
+            return false;
+        }
+
+        if (Number.isFinite(weight) && (weight < 30 || weight > 250)) {
+            showNotification('Вес должен быть от 30 до 250 кг', 'error');
+            return false;
+        }
+
         // Проверка радио-кнопок
         const tumorGradeSelected = document.querySelector('input[name="tumorGrade"]:checked');
         const performanceStatusSelected = document.querySelector('input[name="performanceStatus"]:checked');
@@ -275,6 +291,10 @@ const FormHandler = {
         const positiveNodesValue = parseInt(document.getElementById('positiveLymphNodes').value, 10);
         const tumorSizeValue = parseFloat(document.getElementById('tumorSizeBefore').value);
         const ki67Value = parseFloat(document.getElementById('ki67Level').value);
+        const heightField = document.getElementById('heightCm');
+        const weightField = document.getElementById('weightKg');
+        const heightValue = heightField ? parseFloat(heightField.value) : NaN;
+        const weightValue = weightField ? parseFloat(weightField.value) : NaN;
 
         const erStatus = document.getElementById('erStatus').checked;
         const prStatus = document.getElementById('prStatus').checked;
@@ -303,14 +323,16 @@ const FormHandler = {
             met_brain: metBrain,
             met_liver: metLiver,
             met_lung: metLung,
-            met_none: noMetastasis
+            met_none: noMetastasis,
+            height_cm: Number.isFinite(heightValue) ? heightValue : null,
+            weight_kg: Number.isFinite(weightValue) ? weightValue : null
         };
     },
     
     clearForm() {
         // Текстовые поля и селекты
         const fieldsToClear = [
-            'age', 'stage',
+            'age', 'heightCm', 'weightKg', 'stage',
             'ki67Level', 'tumorSizeBefore', 'chemotherapyRegimen', 'hormoneTherapy'
         ];
         
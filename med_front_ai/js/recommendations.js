@@ -1,4 +1,6 @@
 const Recommendations = {
+    lastResult: null,
+
     showLoading() {
         const recommendationsDiv = document.getElementById('recommendations');
         recommendationsDiv.innerHTML = '<div class="loading">Анализ данных... Пожалуйста, подождите.</div>';
@@ -6,12 +8,14 @@ const Recommendations = {
     },
 
     clear() {
+        this.lastResult = null;
         const recommendationsDiv = document.getElementById('recommendations');
         recommendationsDiv.innerHTML = '<p class="placeholder">Здесь будут отображаться рекомендации после анализа данных</p>';
         this.toggleSaveButton(true);
     },
 
     displayBackendResult(result) {
+        this.lastResult = result;
         const recommendationsDiv = document.getElementById('recommendations');
         const hasSurvival = !!result?.survival;
         const hasTumorData = !!result?.tumor_dynamic;
@@ -49,6 +53,7 @@ const Recommendations = {
         if (hasTumorChartData) {
             html += this.generateChart();
             html += this.renderDosesRecommendations(tumorData.doses);
+            html += this.renderTimings(result.timings_ms);
             recommendationsDiv.innerHTML = html;
             // Увеличиваем задержку, чтобы убедиться, что DOM обновлен
             setTimeout(() => {
@@ -60,6 +65,7 @@ const Recommendations = {
                 console.warn('⚠️ Данные tumor_dynamic есть, но не подходят для графика:', tumorData);
                 html += this.renderDataSection('📉 Динамика опухоли', tumorData);
             }
+            html += this.renderTimings(result.timings_ms);
             recommendationsDiv.innerHTML = html;
         }
 
@@ -80,6 +86,14 @@ const Recommendations = {
         `;
     },
 
+    renderTimings(timings) {
+        if (!timings) return '';
+
+        return `
+            <p class="report-timings">Время расчёта: выживаемость ${timings.survival} мс, динамика опухоли ${timings.tumor_dynamic} мс, всего ${timings.total} мс</p>
+        `;
+    },
+
     renderDosesRecommendations(doses) {
         if (!doses || typeof doses !== 'object' || Object.keys(doses).length === 0) {
             return '';
@@ -32,6 +32,8 @@ function saveToTXT() {
     txtContent += 'ДАННЫЕ ПАЦИЕНТА:\n';
     txtContent += '-'.repeat(30) + '\n';
     txtContent += `Возраст: ${patientData.age} лет\n`;
+    if (patientData.height_cm) txtContent += `Рост: ${patientData.height_cm} см\n`;
+    if (patientData.weight_kg) txtContent += `Вес: ${patientData.weight_kg} кг\n`;
     txtContent += `Стадия: ${patientData.stage}\n`;
     txtContent += `Ki-67: ${patientData.ki67_level}%\n`;
     txtContent += `Размер опухоли: ${patientData.tumor_size_before} мм\n`;
@@ -72,6 +74,16 @@ function saveToTXT() {
     txtContent += '-'.repeat(45) + '\n';
     txtContent += recommendationsText + '\n\n';
     
+    const report = (typeof Recommendations !== 'undefined') ? Recommendations.lastResult : null;
+    if (report?.survival?.model_version) {
+        txtContent += `Версия модели выживаемости: ${report.survival.model_version}\n`;
+    }
+    if (report?.errors) {
+        for (const [section, message] of Object.entries(report.errors)) {
+            txtContent += `Раздел ${section} не рассчитан: ${message}\n`;
+        }
+    }
+
     // Дата и подпись
     txtContent += '='.repeat(50) + '\n';
     txtContent += `Отчет создан: ${new Date().toLocaleDateString('ru-RU')}\n`;